@@ -0,0 +1,55 @@
+"""Файловый кеш, который можно делить между процессами одной машины.
+
+FileBasedCache из Django хранит каждый ключ в своём файле, поэтому
+запись одного процесса сразу видна остальным. Но add и incr в нём — это
+проверка и запись, между которыми успевает другой процесс. Здесь add
+ставит файл жёсткой ссылкой, которая не создаётся поверх существующего
+файла, а incr идёт под файловой блокировкой, так что на add можно
+строить межпроцессные замки.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class SharedFileCache(FileBasedCache):
+    lock_name = 'incr.lock'
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_name), 'a') as lock:
+            locks.lock(lock, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        descriptor, temporary = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(descriptor, 'wb') as output:
+                self._write_content(output, timeout, value)
+            try:
+                os.link(temporary, fname)
+            except FileExistsError:
+                # has_key удаляет просроченный файл, тогда место свободно.
+                if self.has_key(key, version):
+                    return False
+                try:
+                    os.link(temporary, fname)
+                except FileExistsError:
+                    return False
+            return True
+        finally:
+            os.remove(temporary)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            return super().incr(key, delta, version)
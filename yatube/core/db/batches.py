@@ -0,0 +1,14 @@
+"""Размер пачки для запросов со списком значений в IN.
+
+SQLite до 3.32 принимает не больше 999 переменных в запросе, и Django
+знает этот лимит как connection.features.max_query_params (None, если
+лимита нет).
+"""
+
+
+def batch_size(connection, size, reserved=0):
+    """Урезает size, чтобы вместе с reserved параметрами влезть в лимит."""
+    limit = connection.features.max_query_params
+    if limit is None:
+        return size
+    return max(1, min(size, limit - reserved))
@@ -0,0 +1,58 @@
+"""Обслуживание SQLite: статистика планировщика и возврат места.
+
+ANALYZE обновляет sqlite_stat1, по которой планировщик выбирает индексы
+(и по которой админка оценивает размер таблиц), PRAGMA optimize
+досчитывает то, что устарело. incremental_vacuum возвращает системе
+свободные страницы, но работает только в базе с auto_vacuum=INCREMENTAL;
+перевести базу в этот режим можно один раз через enable_incremental_vacuum,
+это полный VACUUM. wal_checkpoint(TRUNCATE) переносит WAL в основной
+файл и обрезает журнал.
+"""
+INCREMENTAL = 2
+
+
+def _value(cursor, sql):
+    cursor.execute(sql)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def enable_incremental_vacuum(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+        return _value(cursor, 'PRAGMA auto_vacuum') == INCREMENTAL
+
+
+def run_maintenance(connection, analysis_limit=None, vacuum_pages=None):
+    """Выполняет обслуживание и возвращает отчёт.
+
+    analysis_limit ограничивает число строк, которые ANALYZE смотрит в
+    каждом индексе; vacuum_pages — сколько свободных страниц вернуть
+    (None — все).
+    """
+    report = {}
+    with connection.cursor() as cursor:
+        if analysis_limit is not None:
+            cursor.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        cursor.execute('ANALYZE')
+        cursor.execute('PRAGMA optimize')
+        free = _value(cursor, 'PRAGMA freelist_count')
+        report['free_pages'] = free
+        report['vacuumed_pages'] = None
+        if _value(cursor, 'PRAGMA auto_vacuum') == INCREMENTAL:
+            pages = free if vacuum_pages is None else int(vacuum_pages)
+            # execute() модуля sqlite3 делает один шаг оператора, а
+            # incremental_vacuum освобождает за шаг одну страницу;
+            # executescript выполняет его до конца.
+            connection.connection.executescript(
+                f'PRAGMA incremental_vacuum({pages});'
+            )
+            report['vacuumed_pages'] = (
+                free - _value(cursor, 'PRAGMA freelist_count')
+            )
+        if _value(cursor, 'PRAGMA journal_mode') == 'wal':
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            cursor.fetchone()
+        report['page_count'] = _value(cursor, 'PRAGMA page_count')
+    return report
@@ -0,0 +1,67 @@
+"""SQLite для продакшена: WAL, прагмы, живые соединения.
+
+Бэкенд — обычный django.db.backends.sqlite3 с тремя отличиями:
+
+* каждое новое соединение получает прагмы из PRAGMAS, их можно
+  переопределить словарём OPTIONS['pragmas']. WAL пускает читателей
+  параллельно с писателем, synchronous=NORMAL в WAL не теряет
+  целостность, а busy_timeout заставляет ждать замок, а не падать с
+  «database is locked»;
+* транзакции начинаются с BEGIN IMMEDIATE (OPTIONS['transaction_mode']):
+  отложенная транзакция, которая сначала читает, а потом пишет, в WAL
+  получает SQLITE_BUSY сразу, без ожидания busy_timeout;
+* при CONN_MAX_AGE соединение переживает запрос, поэтому перед запросом
+  и после него оно проверяется SELECT 1 и закрывается, если сломалось.
+"""
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        pragmas = {**PRAGMAS, **options.get('pragmas', {})}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'IMMEDIATE'
+        )
+        self.cursor().execute(f'BEGIN {mode}')
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def close_if_unusable_or_obsolete(self):
+        if (
+            self.connection is not None
+            and self.settings_dict['CONN_MAX_AGE']
+            and not self.in_atomic_block
+            and not self.is_usable()
+        ):
+            self.close()
+            return
+        super().close_if_unusable_or_obsolete()
@@ -0,0 +1,208 @@
+"""Замеры запроса: время SQL, рендер шаблонов, кеш, превью, пик памяти.
+
+Работают без DEBUG: запросы считаются через execute_wrapper соединения,
+а рендер, обращения к кешу и превью — обёртками над Template.render,
+над get/get_many бэкендов из CACHES и над get_thumbnail бэкенда sorl.
+Обёртки ставятся один раз в CoreConfig.ready и сразу зовут исходный
+метод, если в потоке не идёт замер.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import base as template_base
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import get_module_class
+
+_local = threading.local()
+_original_render = template_base.Template.render
+_install_lock = threading.Lock()
+_installed = False
+_MISSING = object()
+
+
+class Measurement:
+    def __init__(self, statements=False):
+        self.queries = 0
+        self.sql_time = 0.0
+        # Список (sql, секунды), если замер просили со statements.
+        self.statements = [] if statements else None
+        self.render_time = 0.0
+        self.thumbnail_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.wall_time = 0.0
+        self.peak_memory = None
+
+    def as_dict(self):
+        result = {
+            'wall_ms': round(self.wall_time * 1000, 3),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'render_ms': round(self.render_time * 1000, 3),
+            'thumbnail_ms': round(self.thumbnail_time * 1000, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+        if self.peak_memory is not None:
+            result['peak_kb'] = round(self.peak_memory / 1024, 1)
+        return result
+
+
+class _QueryTimer:
+    def __init__(self, measurement):
+        self.measurement = measurement
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.measurement.sql_time += elapsed
+            self.measurement.queries += 1
+            if self.measurement.statements is not None:
+                self.measurement.statements.append((sql, elapsed))
+
+
+def _measuring():
+    return bool(getattr(_local, 'measurements', None))
+
+
+def _timed_render(self, context):
+    measurements = getattr(_local, 'measurements', None)
+    if not measurements or getattr(_local, 'rendering', False):
+        return _original_render(self, context)
+    # Вложенные include считаются внутри внешнего шаблона.
+    _local.rendering = True
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        _local.rendering = False
+        elapsed = time.perf_counter() - started
+        for measurement in measurements:
+            measurement.render_time += elapsed
+
+
+def _count_cache(hits, misses):
+    for measurement in getattr(_local, 'measurements', ()):
+        measurement.cache_hits += hits
+        measurement.cache_misses += misses
+
+
+def _counting_get(original):
+    def get(self, key, default=None, version=None):
+        if not _measuring() or getattr(_local, 'in_cache', False):
+            return original(self, key, default, version)
+        _local.in_cache = True
+        try:
+            value = original(self, key, _MISSING, version)
+        finally:
+            _local.in_cache = False
+        if value is _MISSING:
+            _count_cache(0, 1)
+            return default
+        _count_cache(1, 0)
+        return value
+    return get
+
+
+def _counting_get_many(original):
+    def get_many(self, keys, version=None):
+        if not _measuring() or getattr(_local, 'in_cache', False):
+            return original(self, keys, version)
+        # BaseCache.get_many зовёт get по ключу, это одно обращение.
+        keys = list(keys)
+        _local.in_cache = True
+        try:
+            found = original(self, keys, version)
+        finally:
+            _local.in_cache = False
+        _count_cache(len(found), len(keys) - len(found))
+        return found
+    return get_many
+
+
+def _timed_thumbnail(original):
+    def get_thumbnail(self, *args, **kwargs):
+        if not _measuring() or getattr(_local, 'in_thumbnail', False):
+            return original(self, *args, **kwargs)
+        _local.in_thumbnail = True
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            _local.in_thumbnail = False
+            elapsed = time.perf_counter() - started
+            for measurement in getattr(_local, 'measurements', ()):
+                measurement.thumbnail_time += elapsed
+    return get_thumbnail
+
+
+def install():
+    """Ставит обёртки над рендером, кешем и превью, один раз на процесс."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        template_base.Template.render = _timed_render
+        backend = get_module_class(thumbnail_settings.THUMBNAIL_BACKEND)
+        backend.get_thumbnail = _timed_thumbnail(backend.get_thumbnail)
+        for backend in {type(caches[alias]) for alias in settings.CACHES}:
+            backend.get = _counting_get(backend.get)
+            backend.get_many = _counting_get_many(backend.get_many)
+        _installed = True
+
+
+@contextmanager
+def _collect(measurement):
+    measurements = getattr(_local, 'measurements', None)
+    if measurements is None:
+        measurements = _local.measurements = []
+    measurements.append(measurement)
+    try:
+        yield
+    finally:
+        measurements.remove(measurement)
+
+
+@contextmanager
+def measure(memory=False, using=None, statements=False):
+    """Замеряет блок: стену, SQL, рендер, кеш, превью, пик памяти.
+
+    memory=True включает tracemalloc, это заметно замедляет код, поэтому
+    в продакшене его лучше не трогать. statements=True сохраняет текст и
+    время каждого SQL-запроса.
+    """
+    measurement = Measurement(statements)
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(
+                connections[alias].execute_wrapper(_QueryTimer(measurement))
+            )
+        stack.enter_context(_collect(measurement))
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if memory:
+            # reset_peak есть только с Python 3.9; без него пик свежий,
+            # если трассировку запустили здесь же.
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            measurement.wall_time = time.perf_counter() - started
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                measurement.peak_memory = peak - baseline
+            if tracing:
+                tracemalloc.stop()
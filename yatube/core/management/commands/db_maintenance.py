@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db.maintenance import enable_incremental_vacuum, run_maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'ANALYZE, PRAGMA optimize, incremental vacuum и checkpoint WAL '
+        'для SQLite; с --every повторяет по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--every', type=float,
+            help='Повторять раз в столько секунд, пока не остановят',
+        )
+        parser.add_argument(
+            '--analysis-limit', type=int,
+            help='Сколько строк индекса смотреть ANALYZE (0 — все)',
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int,
+            help='Сколько свободных страниц вернуть за проход',
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='Перевести базу в auto_vacuum=INCREMENTAL (полный VACUUM)',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда только для SQLite')
+        if options['enable_incremental_vacuum']:
+            enable_incremental_vacuum(connection)
+            self.stdout.write('auto_vacuum=INCREMENTAL включён')
+        while True:
+            report = run_maintenance(
+                connection, options['analysis_limit'],
+                options['vacuum_pages'],
+            )
+            vacuumed = report['vacuumed_pages']
+            self.stdout.write(
+                f'Страниц: {report["page_count"]}, свободных: '
+                f'{report["free_pages"]}, возвращено: '
+                + ('—' if vacuumed is None else str(vacuumed))
+            )
+            if not options['every']:
+                break
+            connection.close()
+            time.sleep(options['every'])
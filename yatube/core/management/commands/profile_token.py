@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiler import PARAM, make_token
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт сотруднику токен для профилирования запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(
+                username=options['username'], is_staff=True
+            )
+        except User.DoesNotExist:
+            raise CommandError('Нет сотрудника с таким именем')
+        token = make_token(user)
+        self.stdout.write(token)
+        self.stdout.write(
+            f'Добавьте ?{PARAM}={token} к адресу или заголовок '
+            f'X-Profile: {token}'
+        )
@@ -0,0 +1,194 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит счётчики и гистограммы в памяти под одним замком и
+не чаще раза в METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой файл в
+METRICS_DIR. Страница метрик складывает файлы всех процессов, поэтому
+сервер с несколькими воркерами отдаёт общую картину, а запрос платит
+только за пару сложений. Файлы завершившихся процессов остаются, чтобы
+счётчики не убывали при перезапуске воркеров.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        'Время ответа страницы', LATENCY_BUCKETS,
+    ),
+    'yatube_sql_duration_seconds': (
+        'Время SQL за один запрос к странице', LATENCY_BUCKETS,
+    ),
+    'yatube_sql_queries': (
+        'Число SQL-запросов за один запрос к странице', QUERY_BUCKETS,
+    ),
+    'yatube_template_render_seconds': (
+        'Время рендера шаблонов за один запрос к странице', LATENCY_BUCKETS,
+    ),
+}
+COUNTERS = {
+    'yatube_requests_total': 'Запросы по странице и коду ответа',
+    'yatube_cache_hits_total': 'Попадания в кеш',
+    'yatube_cache_misses_total': 'Промахи кеша',
+}
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.counters = {name: {} for name in COUNTERS}
+        # Гистограмма: счётчики по корзинам без накопления, +Inf,
+        # затем сумма и число наблюдений.
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.flushed = time.monotonic()
+
+    def _observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        row = self.histograms[name].get(labels)
+        if row is None:
+            row = self.histograms[name][labels] = [0] * (len(buckets) + 3)
+        row[bisect.bisect_left(buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def _inc(self, name, labels, value=1):
+        values = self.counters[name]
+        values[labels] = values.get(labels, 0) + value
+
+    def record(self, view, status, measurement):
+        labels = _labels(view=view)
+        with self.lock:
+            if self.pid != os.getpid():
+                # Воркер форкнулся от мастера вместе с его цифрами.
+                self.reset()
+            self._inc('yatube_requests_total', _labels(
+                view=view, status=status
+            ))
+            self._inc('yatube_cache_hits_total', labels,
+                      measurement.cache_hits)
+            self._inc('yatube_cache_misses_total', labels,
+                      measurement.cache_misses)
+            self._observe('yatube_request_duration_seconds', labels,
+                          measurement.wall_time)
+            self._observe('yatube_sql_duration_seconds', labels,
+                          measurement.sql_time)
+            self._observe('yatube_sql_queries', labels, measurement.queries)
+            self._observe('yatube_template_render_seconds', labels,
+                          measurement.render_time)
+            due = (
+                time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps({
+                'counters': self.counters, 'histograms': self.histograms,
+            }))
+
+    def flush(self):
+        """Атомарно перезаписывает файл процесса."""
+        data = self.snapshot()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(data, output)
+        os.replace(temporary, path)
+        with self.lock:
+            self.flushed = time.monotonic()
+        return path
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_at_exit():
+    if any(registry.histograms.values()):
+        registry.flush()
+
+
+def metrics_dir():
+    return settings.METRICS_DIR or os.path.join(
+        tempfile.gettempdir(), 'yatube-metrics'
+    )
+
+
+def collect():
+    """Сумма по файлам всех процессов."""
+    own = registry.flush()
+    total = {
+        'counters': {name: {} for name in COUNTERS},
+        'histograms': {name: {} for name in HISTOGRAMS},
+    }
+    for path in glob.glob(os.path.join(metrics_dir(), '*.json')):
+        try:
+            with open(path) as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            if path == own:
+                raise
+            continue
+        for name, values in data['counters'].items():
+            merged = total['counters'].setdefault(name, {})
+            for labels, value in values.items():
+                merged[labels] = merged.get(labels, 0) + value
+        for name, rows in data['histograms'].items():
+            merged = total['histograms'].setdefault(name, {})
+            for labels, row in rows.items():
+                if labels in merged:
+                    row = [a + b for a, b in zip(merged[labels], row)]
+                merged[labels] = row
+    return total
+
+
+def render_metrics():
+    """Текстовый формат Prometheus 0.0.4."""
+    data = collect()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(data['counters'].get(name, {}).items()):
+            lines.append(f'{name}{{{labels}}} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        rows = data['histograms'].get(name, {})
+        for labels, row in sorted(rows.items()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), row):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{name}_sum{{{labels}}} {row[-2]}')
+            lines.append(f'{name}_count{{{labels}}} {row[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,56 @@
+from .instrumentation import measure
+from .metrics import registry
+from .profiler import check_token, profile_request
+from .slowlog import is_logged, log_request
+
+
+class MetricsMiddleware:
+    """Считает время, SQL, рендер и кеш каждого запроса по имени URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with measure() as measurement:
+            response = self.get_response(request)
+        match = request.resolver_match
+        registry.record(
+            match.view_name if match else 'unmatched',
+            response.status_code,
+            measurement,
+        )
+        return response
+
+
+class SlowRequestMiddleware:
+    """Пишет медленные запросы и выборку быстрых в журнал JSON.
+
+    Текст SQL копится только для страниц, которые попадут в журнал:
+    какая это страница, становится известно в process_view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with measure() as measurement:
+            request.slow_request_measurement = measurement
+            response = self.get_response(request)
+        log_request(request, response, measurement)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_logged(request.resolver_match):
+            request.slow_request_measurement.statements = []
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос сотрудника с подписанным токеном."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if check_token(request):
+            return profile_request(request, self.get_response)
+        return self.get_response(request)
@@ -0,0 +1,189 @@
+"""Профиль одного запроса по требованию персонала.
+
+Запрос профилируется, если пришёл от сотрудника и несёт подписанный
+токен в параметре PARAM или заголовке X-Profile (см. make_token и
+команду profile_token). Пока идёт запрос, отдельный поток раз в
+PROFILER_INTERVAL секунд снимает стек потока запроса: это дешевле
+детерминированного профайлера и не искажает время. Стеки сохраняются в
+свёрнутом виде (collapsed stacks), который понимают flamegraph.pl и
+speedscope, а рядом лежит лента SQL-запросов с их началом и длительностью.
+
+Отчёты пишутся в PROFILER_DIR, хранятся последние PROFILER_KEEP.
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+NAME_PATTERN = re.compile(r'^[0-9a-f-]+$')
+_signer = signing.TimestampSigner(salt='core.profiler')
+
+
+def make_token(user):
+    return _signer.sign(str(user.pk))
+
+
+def check_token(request):
+    """Токен из запроса подписан для этого сотрудника и не истёк."""
+    token = request.GET.get(PARAM) or request.META.get(HEADER)
+    if not token or not request.user.is_staff:
+        return False
+    try:
+        value = _signer.unsign(
+            token, max_age=settings.PROFILER_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == str(request.user.pk)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(settings.BASE_DIR):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def collapse(frame):
+    """Стек от корня к листу через ';', как в collapsed stacks."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Sampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class _SQLTimeline:
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append({
+                'start_ms': round((begin - self.started) * 1000, 3),
+                'duration_ms': round((end - begin) * 1000, 3),
+                'sql': sql,
+                'params': repr(params)[:200],
+            })
+
+
+def profiles_dir():
+    return settings.PROFILER_DIR or os.path.join(
+        tempfile.gettempdir(), 'yatube-profiles'
+    )
+
+
+def profile_request(request, get_response):
+    """Выполняет запрос под профайлером, сохраняет отчёт, отдаёт ответ."""
+    started = time.perf_counter()
+    timeline = _SQLTimeline(started)
+    sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timeline))
+        sampler.start()
+        try:
+            response = get_response(request)
+        finally:
+            sampler.stop()
+    match = request.resolver_match
+    name = save_report({
+        'path': request.get_full_path(),
+        'method': request.method,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'user': request.user.get_username(),
+        'time': time.time(),
+        'wall_ms': round((time.perf_counter() - started) * 1000, 3),
+        'interval_ms': settings.PROFILER_INTERVAL * 1000,
+        'samples': sum(sampler.stacks.values()),
+        'stacks': dict(sampler.stacks),
+        'sql': timeline.queries,
+    })
+    response['X-Profile-Id'] = name
+    return response
+
+
+def save_report(report):
+    """Пишет отчёт и удаляет самые старые сверх PROFILER_KEEP."""
+    directory = profiles_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.time_ns():020d}-{uuid.uuid4().hex[:8]}'
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as output:
+        json.dump(report, output, ensure_ascii=False)
+    os.replace(temporary, os.path.join(directory, f'{name}.json'))
+    for old in list_reports()[settings.PROFILER_KEEP:]:
+        try:
+            os.remove(os.path.join(directory, f'{old}.json'))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def list_reports():
+    """Имена отчётов, новые первыми."""
+    try:
+        files = os.listdir(profiles_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (file[:-5] for file in files if file.endswith('.json')),
+        reverse=True,
+    )
+
+
+def load_report(name):
+    if not NAME_PATTERN.match(name):
+        raise FileNotFoundError(name)
+    with open(os.path.join(profiles_dir(), f'{name}.json')) as source:
+        return json.load(source)
+
+
+def folded(report):
+    """Текст для flamegraph.pl: «стек число» по строке."""
+    return ''.join(
+        f'{stack} {count}\n' for stack, count in report['stacks'].items()
+    )
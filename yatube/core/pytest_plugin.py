@@ -0,0 +1,20 @@
+"""Pytest-плагин: тест падает, если страница вышла за бюджет запросов.
+
+Подключается в conftest.py через pytest_plugins. Бюджеты объявлены
+декоратором core.query_budget.query_budget на view.
+"""
+import pytest
+
+from .query_budget import collect
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    with collect() as violations:
+        outcome = yield
+    if violations and outcome.excinfo is None:
+        pytest.fail(
+            'Превышен бюджет SQL-запросов:\n'
+            + '\n'.join(str(violation) for violation in violations),
+            pytrace=False,
+        )
@@ -0,0 +1,165 @@
+"""Бюджет SQL-запросов на страницу.
+
+Декоратор query_budget(n) объявляет, сколько запросов может сделать
+view вместе с рендером шаблона. В продакшене он ничего не делает. При
+DEBUG превышение пишется в лог или, при QUERY_BUDGET_ACTION = 'raise',
+поднимает QueryBudgetExceeded. Внутри collect() превышения не мешают
+ответу, а складываются в список: так их собирает pytest-плагин
+core.pytest_plugin. Запросы внутри exempt() не считаются: это работа,
+которая в продакшене идёт в фоне или один раз заполняет кеш.
+
+В отчёт попадают повторяющиеся запросы — типичный след N+1 — со строкой
+шаблона и строками кода проекта, откуда они пришли.
+"""
+import functools
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+_collectors = []
+_collectors_lock = threading.Lock()
+# Обёртки замеров, которые стоят в стеке любого запроса.
+_SKIP_FILES = {__file__, instrumentation.__file__}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Violation:
+    def __init__(self, view, budget, queries):
+        self.view = view
+        self.budget = budget
+        self.queries = queries
+
+    def duplicates(self):
+        """[(sql, число, места)] для запросов, выполненных не один раз."""
+        grouped = defaultdict(list)
+        for sql, where in self.queries:
+            grouped[sql].append(where)
+        return sorted(
+            (
+                (sql, len(places), list(dict.fromkeys(places)))
+                for sql, places in grouped.items() if len(places) > 1
+            ),
+            key=lambda item: -item[1],
+        )
+
+    def __str__(self):
+        lines = [
+            f'{self.view}: {len(self.queries)} SQL-запросов '
+            f'при бюджете {self.budget}'
+        ]
+        for sql, count, places in self.duplicates():
+            lines.append(f'  {count}× {sql}')
+            for where in places[:3]:
+                lines.extend(f'      {line}' for line in where)
+        return '\n'.join(lines)
+
+
+def _origin():
+    """Строка шаблона и строки кода проекта, откуда выполняется запрос."""
+    template = None
+    code = []
+    frame = sys._getframe(2)
+    while frame is not None:
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                name = origin.template_name or origin.name
+                template = f'шаблон {name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(settings.BASE_DIR)
+            and filename not in _SKIP_FILES
+            and len(code) < 4
+        ):
+            line = (
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} in {frame.f_code.co_name}'
+            )
+            if line not in code:
+                code.append(line)
+        frame = frame.f_back
+    return ((template,) if template else ()) + tuple(code)
+
+
+class _Recorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(_local, 'exempt', False):
+            self.queries.append((sql, _origin()))
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def exempt():
+    """Не считать запросы блока в бюджет страницы."""
+    previous = getattr(_local, 'exempt', False)
+    _local.exempt = True
+    try:
+        yield
+    finally:
+        _local.exempt = previous
+
+
+@contextmanager
+def collect():
+    """Собирает превышения бюджета вместо лога и исключений."""
+    violations = []
+    with _collectors_lock:
+        _collectors.append(violations)
+    try:
+        yield violations
+    finally:
+        with _collectors_lock:
+            _collectors.remove(violations)
+
+
+def _report(violation):
+    if _collectors:
+        # Превышение достаётся только самому вложенному collect().
+        with _collectors_lock:
+            _collectors[-1].append(violation)
+    elif settings.QUERY_BUDGET_ACTION == 'raise':
+        raise QueryBudgetExceeded(str(violation))
+    else:
+        logger.warning('%s', violation)
+
+
+def query_budget(limit):
+    """Ограничивает число SQL-запросов view, включая рендер шаблона."""
+    def decorator(view):
+        name = f'{view.__module__}.{view.__name__}'
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not (settings.DEBUG or _collectors):
+                return view(request, *args, **kwargs)
+            recorder = _Recorder()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(recorder)
+                    )
+                response = view(request, *args, **kwargs)
+            if len(recorder.queries) > limit:
+                _report(Violation(name, limit, recorder.queries))
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
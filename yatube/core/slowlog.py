@@ -0,0 +1,127 @@
+"""Журнал медленных запросов в JSON Lines.
+
+log_request пишет в логгер yatube.slow_requests запись о запросе к
+страницам из SLOW_REQUEST_NAMESPACES, если он шёл дольше
+SLOW_REQUEST_THRESHOLD или один из его SQL-запросов шёл дольше
+SLOW_QUERY_THRESHOLD. Быстрые запросы попадают в журнал с вероятностью
+SLOW_REQUEST_SAMPLE_RATE, чтобы было с чем сравнивать.
+
+BackgroundHandler только кладёт запись в очередь, а форматирует и пишет
+её отдельный поток, так что ответ не ждёт диска. Если очередь полна,
+запись отбрасывается и учитывается в dropped.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow_requests')
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # При остановке ждём места в очереди, а не теряем хвост журнала.
+        self.queue.put(self._sentinel)
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    def __init__(self, filename=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        filename = filename or os.path.join(
+            tempfile.gettempdir(), 'yatube-slow-requests.jsonl'
+        )
+        target = logging.FileHandler(filename, encoding='utf-8', delay=True)
+        target.setFormatter(JSONFormatter())
+        self.dropped = 0
+        self.listener = _Listener(self.queue, target)
+        self.listener.start()
+        self.running = True
+
+    def prepare(self, record):
+        # Форматирование тоже уходит в фоновый поток.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Дописывает очередь; logging.shutdown зовёт это при выходе."""
+        if self.running:
+            self.running = False
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+        super().close()
+
+
+def _reason(measurement):
+    if measurement.wall_time >= settings.SLOW_REQUEST_THRESHOLD:
+        return 'slow'
+    if any(
+        elapsed >= settings.SLOW_QUERY_THRESHOLD
+        for _, elapsed in measurement.statements
+    ):
+        return 'slow_query'
+    if random.random() < settings.SLOW_REQUEST_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def is_logged(match):
+    """Страница из SLOW_REQUEST_NAMESPACES, её запросы идут в журнал."""
+    return (
+        match is not None
+        and bool(match.namespaces)
+        and match.namespaces[0] in settings.SLOW_REQUEST_NAMESPACES
+    )
+
+
+def log_request(request, response, measurement):
+    """Пишет запись о запросе, если он медленный или попал в выборку."""
+    match = request.resolver_match
+    # Без statements запрос не дошёл до process_view middleware.
+    if not is_logged(match) or measurement.statements is None:
+        return
+    reason = _reason(measurement)
+    if reason is None:
+        return
+    user = getattr(request, 'user', None)
+    statements = measurement.statements
+    limit = settings.SLOW_REQUEST_MAX_STATEMENTS
+    logger.info({
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'reason': reason,
+        'view': match.view_name,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user_id': user.pk if user is not None else None,
+        'duration_ms': round(measurement.wall_time * 1000, 3),
+        'render_ms': round(measurement.render_time * 1000, 3),
+        'thumbnail_ms': round(measurement.thumbnail_time * 1000, 3),
+        'cache': {
+            'hits': measurement.cache_hits,
+            'misses': measurement.cache_misses,
+        },
+        'sql_count': measurement.queries,
+        'sql_ms': round(measurement.sql_time * 1000, 3),
+        'sql': [
+            {'sql': sql, 'ms': round(elapsed * 1000, 3)}
+            for sql, elapsed in statements[:limit]
+        ],
+        'sql_truncated': len(statements) > limit,
+    })
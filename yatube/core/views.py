@@ -1,5 +1,12 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from . import profiler
+from .metrics import render_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,34 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not (allowed or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4'
+    )
+
+
+@staff_member_required
+def profiles(request):
+    return JsonResponse({'profiles': profiler.list_reports()})
+
+
+@staff_member_required
+def profile_report(request, name):
+    try:
+        report = profiler.load_report(name)
+    except FileNotFoundError:
+        raise Http404
+    if request.GET.get('format') == 'folded':
+        response = HttpResponse(
+            profiler.folded(report), content_type='text/plain'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{name}.folded"'
+        )
+        return response
+    return JsonResponse(report, json_dumps_params={'ensure_ascii': False})
@@ -1,6 +1,61 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import connection, transaction
+from django.db.models.functions import Substr
+from django.utils import timezone
 
+from core.db.batches import batch_size
+
+from .cache import bump_listing_version
 from .models import Group, Post
+from .paginators import EstimatedCountPaginator
+from .search import filter_posts
+
+
+class PostActionForm(ActionForm):
+    group = forms.SlugField(
+        label='Группа (slug)',
+        required=False,
+        help_text='Пусто, чтобы убрать группу',
+    )
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, который берёт выбранный объект из строки списка.
+
+    Обычный AutocompleteSelect делает запрос за подписью выбранного
+    значения на каждую строку list_editable.
+    """
+
+    selected_objects = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected_objects is None:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        selected = {str(item) for item in value}
+        for obj in self.selected_objects:
+            if str(obj.pk) in selected:
+                options.append(self.create_option(
+                    name, obj.pk, self.choices.field.label_from_instance(obj),
+                    True, len(options),
+                ))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        widget = getattr(widget, 'widget', widget)
+        if isinstance(widget, RowAutocompleteSelect):
+            group = self.instance.group
+            widget.selected_objects = [group] if group else []
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,9 +67,91 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display: str = '-пусто-'
+    autocomplete_fields = ('group',)
+    raw_id_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('reassign_group',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = RowAutocompleteSelect(
+                db_field.remote_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_list_display(self, request):
+        # Вместо полного текста в списке показывается начало,
+        # обрезанное ещё в SQL.
+        return tuple(
+            'short_text' if name == 'text' else name
+            for name in super().get_list_display(request)
+        )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            text_start=Substr('text', 1, settings.POST_ADMIN_TEXT_LENGTH + 1)
+        ).defer('text')
+
+    def short_text(self, obj):
+        if len(obj.text_start) > settings.POST_ADMIN_TEXT_LENGTH:
+            return obj.text_start[:settings.POST_ADMIN_TEXT_LENGTH] + '…'
+        return obj.text_start
+    short_text.short_description = 'Содержание'
+    short_text.admin_order_field = 'text'
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет через поисковый индекс вместо LIKE по всей таблице.
+
+        Индекс отбирает посты подзапросом: список id в pk__in упёрся бы
+        в лимит переменных SQLite.
+        """
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+    def reassign_group(self, request, queryset):
+        """Переносит посты в группу пачками UPDATE по первичному ключу."""
+        slug = request.POST.get('group')
+        group = None
+        if slug:
+            group = Group.objects.filter(slug=slug).first()
+            if group is None:
+                self.message_user(
+                    request, f'Группы {slug} нет', messages.ERROR
+                )
+                return
+        ids = queryset.order_by('pk').values_list('pk', flat=True)
+        # Кроме id в UPDATE уходят ещё группа и время изменения.
+        size = batch_size(connection, settings.POST_ADMIN_BATCH, reserved=2)
+        moved = 0
+        batch = []
+        for pk in ids.iterator():
+            batch.append(pk)
+            if len(batch) == size:
+                moved += self._move_batch(batch, group)
+                batch = []
+        moved += self._move_batch(batch, group)
+        bump_listing_version()
+        self.message_user(request, f'Перенесено постов: {moved}')
+    reassign_group.short_description = 'Перенести в группу'
+
+    def _move_batch(self, batch, group):
+        with transaction.atomic():
+            return Post.objects.filter(pk__in=batch).update(
+                group=group, updated=timezone.now()
+            )
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -23,7 +160,7 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
-    search_fields = ('text',)
+    search_fields = ('title', 'slug')
     empty_value_display: str = '-пусто-'
 
 
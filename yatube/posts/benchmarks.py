@@ -0,0 +1,98 @@
+"""Бенчмарк страниц постов через тестовый клиент.
+
+run_benchmarks прогоняет каждую страницу несколько раз и берёт медиану
+по каждой метрике, compare ищет метрики, которые выросли больше порога
+относительно прошлого прогона.
+"""
+import statistics
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.instrumentation import measure
+
+from .models import Group, Post, User
+
+METRICS = ('wall_ms', 'queries', 'sql_ms', 'render_ms', 'peak_kb')
+# Разница меньше этих значений считается шумом, даже если она выше порога.
+NOISE = {'wall_ms': 1.0, 'sql_ms': 0.5, 'render_ms': 0.5, 'peak_kb': 16.0}
+
+
+def _pick_targets():
+    author = User.objects.order_by('-counters__posts_count').first()
+    reader = User.objects.order_by('-counters__following_count').first()
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    if not (author and reader and group and post):
+        raise ValueError('Для бенчмарка нужна заполненная база, см. seed_load')
+    return author, reader, group, post
+
+
+def benchmark_requests():
+    """Пары (имя, функция запроса) для каждой страницы."""
+    author, reader, group, post = _pick_targets()
+    guest = Client()
+    client = Client()
+    client.force_login(reader)
+    return [
+        ('index', lambda: guest.get(reverse('posts:index'))),
+        ('group_posts', lambda: guest.get(reverse(
+            'posts:group_posts', kwargs={'slug': group.slug}
+        ))),
+        ('profile', lambda: guest.get(reverse(
+            'posts:profile', kwargs={'username': author.username}
+        ))),
+        ('post_detail', lambda: guest.get(reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        ))),
+        ('follow_index', lambda: client.get(reverse('posts:follow_index'))),
+        ('add_comment', lambda: client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий из бенчмарка'},
+        )),
+    ]
+
+
+def run_benchmarks(repeat=5, warm=False, memory=True):
+    """Медианы метрик по страницам: {'index': {'wall_ms': ...}, ...}.
+
+    Без warm кеш очищается перед каждым запросом, и замеряется работа
+    самой страницы, а не чтение готового ответа из кеша.
+    """
+    results = {}
+    for name, request in benchmark_requests():
+        request()  # прогрев: импорты, загрузка шаблонов
+        runs = []
+        for _ in range(repeat):
+            if not warm:
+                cache.clear()
+            with measure(memory=memory) as measurement:
+                response = request()
+            if response.status_code >= 400:
+                raise ValueError(f'{name} ответила {response.status_code}')
+            runs.append(measurement.as_dict())
+        results[name] = {
+            metric: round(statistics.median(run[metric] for run in runs), 3)
+            for metric in METRICS if metric in runs[0]
+        }
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Регрессии: список (страница, метрика, было, стало)."""
+    regressions = []
+    for name, metrics in current.items():
+        before = baseline.get(name, {})
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            if old is None:
+                continue
+            if value - old <= NOISE.get(metric, 0):
+                continue
+            if value > old * (1 + threshold):
+                regressions.append((name, metric, old, value))
+    return regressions
@@ -0,0 +1,113 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+LISTING_VERSION_KEY = 'posts:listing:version'
+
+
+def listing_version():
+    """Текущая версия списков постов.
+
+    Начальное значение берётся из времени, чтобы после вытеснения ключа
+    из кеша версия не вернулась к уже использованной.
+    """
+    version = cache.get(LISTING_VERSION_KEY)
+    if version is None:
+        cache.add(LISTING_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(LISTING_VERSION_KEY)
+    return version
+
+
+def bump_listing_version():
+    """Делает недействительными все закешированные списки постов."""
+    try:
+        cache.incr(LISTING_VERSION_KEY)
+    except ValueError:
+        listing_version()
+
+
+def listing_timeout():
+    """Сколько держать список: долго, только если кеш общий для процессов.
+
+    Версию в LocMemCache меняет лишь процесс, в котором была запись,
+    остальные отдавали бы старую страницу весь LISTING_CACHE_TIMEOUT.
+    """
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return settings.LISTING_CACHE_LOCAL_TIMEOUT
+    return settings.LISTING_CACHE_TIMEOUT
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{request.user.pk or 0}:{path}'
+
+
+def listing_cache_key(request):
+    return f'posts:listing:{listing_version()}:{_page_key(request)}'
+
+
+def last_render_key(request):
+    """Ключ последней сборки страницы, без версии: переживает запись."""
+    return f'posts:listing:last:{_page_key(request)}'
+
+
+def _wait_for_entry(key, lock_key):
+    """Ждёт, пока другой процесс пересоберёт страницу, пока жив замок."""
+    deadline = time.monotonic() + settings.LISTING_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def cache_listing(view):
+    """Кеширует страницу списка до следующей записи в постах или группах.
+
+    В отличие от cache_page ключ включает версию списков, поэтому запись
+    можно держать часами: после изменения поста версия меняется и
+    следующий запрос собирает страницу заново.
+
+    Пересобирает страницу только запрос, взявший замок через cache.add
+    общего кеша, то есть один на все процессы. Остальные получают
+    прежнюю копию: просроченную запись этой версии или последнюю сборку
+    страницы до смены версии, которая хранится под ключом без версии.
+    Ждут результата только запросы к странице, которую ещё не собирали.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = listing_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        last_key = last_render_key(request)
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, settings.LISTING_CACHE_LOCK_TIMEOUT):
+            entry = entry or cache.get(last_key)
+            if entry is None:
+                entry = _wait_for_entry(key, lock_key)
+            if entry is not None:
+                return entry[1]
+            return view(request, *args, **kwargs)
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                timeout = listing_timeout()
+                entry = (time.time() + timeout, response)
+                cache.set_many(
+                    {key: entry, last_key: entry},
+                    timeout + settings.LISTING_CACHE_GRACE,
+                )
+        finally:
+            cache.delete(lock_key)
+        return response
+    return wrapper
@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
 from .models import Comment, Post
+from .uploads import downscale, open_header
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +11,18 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Проверяет новую картинку по заголовку и уменьшает оригинал."""
+        upload = self.cleaned_data['image']
+        if not isinstance(upload, UploadedFile):
+            return upload
+        image = open_header(upload)
+        upload = downscale(upload, image)
+        upload.image = image
+        upload.content_type = Image.MIME.get(image.format)
+        upload.seek(0)
+        return upload
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,414 @@
+"""Нагрузочный прогон WSGI-приложения по HTTP.
+
+serve поднимает yatube.wsgi.application в многопоточном сервере внутри
+этого же процесса, run_load гоняет против него смесь сценариев из
+SCENARIOS в нескольких потоках. Pacer раздаёт запросам моменты отправки
+равномерно по времени, чтобы суммарный поток держался на заданном RPS.
+Задержка считается от запланированного момента, а не от фактической
+отправки: если сервер не успевает, ожидание в очереди попадает в
+перцентили, а не прячется за снизившейся нагрузкой.
+
+Ошибка SQLite «database is locked» внутри запроса превращается в 500,
+поэтому сервер помечает такие ответы заголовком LOCK_HEADER, и в отчёте
+блокировки считаются отдельно от прочих ошибок.
+"""
+import contextlib
+import http.client
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY,
+)
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer, WSGIRequestHandler,
+)
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.shortcuts import resolve_url
+from django.urls import Resolver404, resolve, reverse
+from PIL import Image
+
+from .models import Group, Post, User
+from .seeding import WORDS
+
+LOCK_HEADER = 'X-Database-Locked'
+PERCENTILES = (50, 95, 99)
+DEFAULT_MIX = {
+    'browse': 60, 'feed': 15, 'follow': 10, 'comment': 10, 'post': 5,
+}
+
+_state = threading.local()
+
+
+class Finished(Exception):
+    """Расписание запросов закончилось."""
+
+
+class LoadServer(ThreadedWSGIServer):
+    request_queue_size = 128
+
+    def process_request_thread(self, request, client_address):
+        # Поток живёт один запрос, а соединение с CONN_MAX_AGE пережило бы
+        # его и осталось открытым до сборки мусора.
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            connections.close_all()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _remember_exception(sender, request=None, **kwargs):
+    _state.error = sys.exc_info()[1]
+
+
+def mark_locked(app):
+    """Добавляет LOCK_HEADER к ответу, если запрос упал на блокировке."""
+    def wrapped(environ, start_response):
+        _state.error = None
+
+        def marking_start_response(status, headers, exc_info=None):
+            error = _state.error
+            if isinstance(error, OperationalError) and 'locked' in str(error):
+                headers = headers + [(LOCK_HEADER, '1')]
+            return start_response(status, headers, exc_info)
+        return app(environ, marking_start_response)
+    return wrapped
+
+
+@contextlib.contextmanager
+def serve(app=None):
+    """Запускает приложение на свободном порту и отдаёт его адрес."""
+    if app is None:
+        from yatube.wsgi import application as app
+    server = LoadServer(('127.0.0.1', 0), QuietRequestHandler)
+    server.set_app(mark_locked(app))
+    got_request_exception.connect(_remember_exception)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        got_request_exception.disconnect(_remember_exception)
+
+
+class Pacer:
+    """Раздаёт моменты отправки с шагом 1/rps до конца прогона."""
+
+    def __init__(self, rps, duration):
+        self.interval = 1 / rps
+        self.start = time.perf_counter()
+        self.end = self.start + duration
+        self.next = self.start
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            slot = self.next
+            self.next += self.interval
+        if slot >= self.end:
+            raise Finished
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return slot
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.locked = defaultdict(int)
+
+    def add(self, name, latency, error, locked):
+        with self.lock:
+            self.latencies[name].append(latency)
+            self.errors[name] += error
+            self.locked[name] += locked
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    rank = math.ceil(percent / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def summarize(recorder, elapsed):
+    """Отчёт по именам URL и итог по всем запросам."""
+    names = sorted(recorder.latencies)
+    rows = {name: (
+        recorder.latencies[name], recorder.errors[name],
+        recorder.locked[name],
+    ) for name in names}
+    rows['total'] = (
+        [value for name in names for value in recorder.latencies[name]],
+        sum(recorder.errors.values()),
+        sum(recorder.locked.values()),
+    )
+    report = {}
+    for name, (latencies, errors, locked) in rows.items():
+        latencies = sorted(latencies)
+        row = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4)
+            if latencies else 0,
+            'locked': locked,
+        }
+        for percent in PERCENTILES:
+            row[f'p{percent}_ms'] = round(
+                percentile(latencies, percent) * 1000, 1
+            ) if latencies else None
+        report[name] = row
+    report['total']['rps'] = round(len(rows['total'][0]) / elapsed, 1)
+    return report
+
+
+def url_name(path):
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return urlsplit(path).path
+
+
+def login_cookie(user):
+    """Ключ сессии, как после входа на сайт."""
+    session = SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; '
+            f'name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; '
+            f'name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Session:
+    """Один посетитель: cookie, CSRF-токен и запись результатов."""
+
+    def __init__(self, base_url, pacer, recorder, user=None):
+        address = urlsplit(base_url)
+        self.host, self.port = address.hostname, address.port
+        self.pacer = pacer
+        self.recorder = recorder
+        self.user = user
+        request = HttpRequest()
+        self.csrf_token = get_token(request)
+        self.cookies = {
+            settings.CSRF_COOKIE_NAME: request.META['CSRF_COOKIE'],
+        }
+        if user is not None:
+            self.cookies[settings.SESSION_COOKIE_NAME] = login_cookie(user)
+        self.login_url = resolve_url(settings.LOGIN_URL)
+
+    def request(self, method, path, body=None, content_type=None):
+        slot = self.pacer.wait()
+        headers = {'Cookie': '; '.join(
+            f'{name}={value}' for name, value in self.cookies.items()
+        )}
+        if content_type:
+            headers['Content-Type'] = content_type
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=60
+        )
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            locked = response.getheader(LOCK_HEADER) is not None
+            location = response.getheader('Location', '')
+        except OSError:
+            status, locked, location = 0, False, ''
+        finally:
+            connection.close()
+        error = (
+            not 200 <= status < 400 or location.startswith(self.login_url)
+        )
+        self.recorder.add(
+            url_name(path), time.perf_counter() - slot, error, locked
+        )
+        return status
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, fields, files=None):
+        fields = dict(fields, csrfmiddlewaretoken=self.csrf_token)
+        if files:
+            body, content_type = multipart(fields, files)
+        else:
+            body = urlencode(fields).encode()
+            content_type = 'application/x-www-form-urlencoded'
+        return self.request('POST', path, body, content_type)
+
+
+class Targets:
+    """Что открывать: свежие посты, группы, активные авторы."""
+
+    def __init__(self, logins):
+        self.posts = list(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)[:1000]
+        )
+        self.groups = list(Group.objects.values_list('slug', flat=True)[:200])
+        self.authors = list(User.objects.filter(
+            counters__posts_count__gt=0
+        ).order_by('-counters__posts_count').values_list(
+            'username', flat=True
+        )[:200])
+        self.users = list(User.objects.order_by('pk')[:logins])
+        if not (self.posts and self.groups and self.authors):
+            raise ValueError(
+                'Для прогона нужна заполненная база, см. seed_load'
+            )
+
+
+def _text(rng, words=12):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def _image(rng):
+    image = Image.new('RGB', (rng.randint(200, 800), rng.randint(150, 600)),
+                      tuple(rng.randrange(256) for _ in range(3)))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+def browse(session, targets, rng):
+    session.get(reverse('posts:index'))
+    session.get(reverse('posts:index') + f'?page={rng.randint(2, 5)}')
+    session.get(reverse(
+        'posts:group_posts', kwargs={'slug': rng.choice(targets.groups)}
+    ))
+    session.get(reverse(
+        'posts:profile', kwargs={'username': rng.choice(targets.authors)}
+    ))
+    session.get(reverse(
+        'posts:post_detail', kwargs={'post_id': rng.choice(targets.posts)}
+    ))
+    if rng.random() < 0.3:
+        session.get(reverse('posts:search') + '?' + urlencode(
+            {'q': rng.choice(WORDS)}
+        ))
+
+
+def feed(session, targets, rng):
+    session.get(reverse('posts:follow_index'))
+    session.get(reverse('posts:index'))
+    session.get(reverse(
+        'posts:post_detail', kwargs={'post_id': rng.choice(targets.posts)}
+    ))
+
+
+def follow(session, targets, rng):
+    username = rng.choice(targets.authors)
+    session.get(reverse('posts:profile', kwargs={'username': username}))
+    session.get(reverse(
+        'posts:profile_follow', kwargs={'username': username}
+    ))
+    session.get(reverse('posts:follow_index'))
+    if rng.random() < 0.5:
+        session.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': username}
+        ))
+
+
+def comment(session, targets, rng):
+    post_id = rng.choice(targets.posts)
+    session.get(reverse('posts:post_detail', kwargs={'post_id': post_id}))
+    session.post(
+        reverse('posts:add_comment', kwargs={'post_id': post_id}),
+        {'text': _text(rng, 8)},
+    )
+
+
+def post(session, targets, rng):
+    session.get(reverse('posts:post_create'))
+    files = None
+    if rng.random() < 0.5:
+        files = {'image': ('load.jpg', _image(rng))}
+    session.post(
+        reverse('posts:post_create'), {'text': _text(rng, 30)}, files
+    )
+
+
+# Сценарий: (нужен ли вход, функция).
+SCENARIOS = {
+    'browse': (False, browse),
+    'feed': (True, feed),
+    'follow': (True, follow),
+    'comment': (True, comment),
+    'post': (True, post),
+}
+
+
+def _worker(guest, member, targets, mix, rng):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    try:
+        while True:
+            login, scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            scenario(member if login else guest, targets, rng)
+    except Finished:
+        pass
+
+
+def run_load(base_url, duration=30, rps=20, concurrency=8, mix=None,
+             seed=0):
+    """Прогоняет смесь сценариев и возвращает отчёт summarize."""
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+    targets = Targets(concurrency)
+    recorder = Recorder()
+    pacer = Pacer(rps, duration)
+    threads = []
+    for number in range(concurrency):
+        user = targets.users[number % len(targets.users)]
+        threads.append(threading.Thread(target=_worker, args=(
+            Session(base_url, pacer, recorder),
+            Session(base_url, pacer, recorder, user),
+            targets, mix, random.Random(seed + number),
+        )))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(recorder, time.perf_counter() - pacer.start)
@@ -0,0 +1,103 @@
+import json
+import platform
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+
+from posts.benchmarks import compare, run_benchmarks
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы постов на синтетической базе и сравнивает '
+        'с прошлым прогоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост метрики, доля (0.2 — на 20%%)',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кеш между запросами',
+        )
+        parser.add_argument(
+            '--no-memory', action='store_true',
+            help='Не включать tracemalloc',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Оставить тестовую базу с данными для следующего прогона',
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            if not Post.objects.exists():
+                call_command(
+                    'seed_load',
+                    users=options['users'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    seed=options['seed'],
+                    stdout=self.stderr,
+                )
+            views = run_benchmarks(
+                options['repeat'], options['warm'], not options['no_memory']
+            )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'users': options['users'],
+                'posts': options['posts'],
+                'comments': options['comments'],
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'warm': options['warm'],
+            },
+            'views': views,
+        }
+        for name, metrics in views.items():
+            self.stdout.write(f'{name:<14}' + '  '.join(
+                f'{metric}={value}' for metric, value in metrics.items()
+            ))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = compare(
+                    json.load(baseline)['views'], views, options['threshold']
+                )
+            if regressions:
+                raise CommandError('Регрессии:\n' + '\n'.join(
+                    f'  {name} {metric}: {old} -> {new}'
+                    for name, metric, old, new in regressions
+                ))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Строит адаптивные варианты картинок для постов, где их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать варианты и у постов, где они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(variants__isnull=True)
+        built = 0
+        for post in posts.iterator():
+            generate_variants(post)
+            built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов с картинками: {built}'
+        ))
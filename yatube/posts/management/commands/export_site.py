@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_site
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в JSON Lines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Куда писать файл')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'w', encoding='utf-8') as stream:
+            written = export_site(stream)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено записей: {written}'))
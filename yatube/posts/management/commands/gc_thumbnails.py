@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.thumbnail_gc import collect_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет превью удалённых и изменённых картинок, осиротевшие файлы '
+        'кеша и давно не читанные превью сверх бюджета'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget', type=int, default=settings.THUMBNAIL_CACHE_BUDGET,
+            help='Сколько байт могут занимать превью (по умолчанию '
+                 'THUMBNAIL_CACHE_BUDGET)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено',
+        )
+
+    def handle(self, *args, **options):
+        report = collect_thumbnails(options['budget'], options['dry_run'])
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            f'{verb} записей картинок без постов: {report["sources"]}\n'
+            f'{verb} осиротевших файлов: {report["orphans"]} '
+            f'({report["orphan_bytes"]} байт)\n'
+            f'{verb} по бюджету: {report["evicted"]} '
+            f'({report["evicted_bytes"]} байт)'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Осталось превью: {report["kept"]} ({report["kept_bytes"]} байт)'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import SiteImporter, rebuild_derived
+
+
+class Command(BaseCommand):
+    help = 'Загружает данные сайта из JSON Lines, выгруженного export_site'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл от export_site')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять одним bulk_create',
+        )
+
+    def handle(self, *args, **options):
+        importer = SiteImporter(options['batch_size'])
+        with open(options['path'], encoding='utf-8') as lines:
+            counts = importer.load(lines)
+        rebuild_derived()
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            'Ленты, счётчики и поисковый индекс пересобраны'
+        ))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loadtest import DEFAULT_MIX, PERCENTILES, run_load, serve
+
+
+def parse_mix(value):
+    """'browse=60,post=5' -> {'browse': 60.0, 'post': 5.0}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Поднимает приложение на локальном порту и нагружает его смесью '
+        'сценариев гостей и вошедших пользователей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--rps', type=float, default=20)
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Сколько посетителей работают одновременно',
+        )
+        parser.add_argument(
+            '--mix', type=parse_mix,
+            default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+            help='Веса сценариев: browse, feed, follow, comment, post',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Куда сохранить отчёт в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            with serve() as base_url:
+                report = run_load(
+                    base_url, options['duration'], options['rps'],
+                    options['concurrency'], options['mix'], options['seed'],
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        columns = [f'p{percent}_ms' for percent in PERCENTILES]
+        self.stdout.write(f'{"":<24}{"запросов":>9}{"ошибок":>8}'
+                          f'{"блок.":>7}' + ''.join(
+                              f'{column:>10}' for column in columns))
+        for name, row in report.items():
+            self.stdout.write(
+                f'{name:<24}{row["requests"]:>9}{row["errors"]:>8}'
+                f'{row["locked"]:>7}'
+                + ''.join(f'{row[column]!s:>10}' for column in columns)
+            )
+        self.stdout.write(f'Выдержано {report["total"]["rps"]} запросов/с')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.cache import bump_listing_version
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по хешу содержимого '
+        'и переписывает пути в Post.image'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-old', action='store_true',
+            help='Удалить старые файлы, на которые больше никто не ссылается',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        moved = missing = 0
+        old_names = set()
+        posts = Post.objects.exclude(image='').only('pk', 'image')
+        for post in posts.iterator():
+            name = post.image.name
+            if storage.is_content_name(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла {name} у поста {post.pk}')
+                continue
+            with storage.open(name) as source:
+                new_name = storage.save(name, source)
+            Post.objects.filter(pk=post.pk, image=name).update(
+                image=new_name, updated=timezone.now()
+            )
+            post.image.name = new_name
+            generate_thumbnails(post.image)
+            old_names.add(name)
+            moved += 1
+        if moved:
+            bump_listing_version()
+        if options['delete_old']:
+            in_use = set(Post.objects.filter(
+                image__in=old_names
+            ).values_list('image', flat=True))
+            for name in old_names - in_use:
+                storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, не найдено файлов: {missing}'
+        ))
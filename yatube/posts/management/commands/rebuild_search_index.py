@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import get_engine
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = get_engine().rebuild(Post.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
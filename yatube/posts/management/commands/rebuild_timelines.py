@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def handle(self, *args, **options):
+        count = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, записей: {count}'
+        ))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import SeedLoader
+from posts.transfer import rebuild_derived
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, группы, посты, комментарии '
+        'и подписки для проверки под нагрузкой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Сколько подписок в среднем у пользователя',
+        )
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок сгенерировать для постов',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-search', action='store_true',
+            help='Не пересобирать поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        loader = SeedLoader(options['seed'], options['batch_size'])
+        users = loader.users(options['users'])
+        groups = loader.groups(options['groups'])
+        images = loader.images(options['images'])
+        posts = loader.posts(
+            options['posts'], users, groups, images, options['image_share']
+        )
+        self.stdout.write(f'Пользователей: {len(users)}, групп: '
+                          f'{len(groups)}, постов: {len(posts)}')
+        follows = loader.follows(users, options['follows'])
+        comments = loader.comments(options['comments'], users, posts)
+        self.stdout.write(f'Подписок: {follows}, комментариев: {comments}')
+        rebuild_derived(search=not options['no_search'])
+        self.stdout.write(self.style.SUCCESS(
+            'Ленты, счётчики и индексы пересобраны'
+        ))
@@ -0,0 +1,56 @@
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+# Копия posts.search на момент миграции: изменения модуля не должны
+# менять уже применённую историю.
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+
+
+def stem_words(text, russian, english):
+    stems = []
+    for word in WORD.findall(text.lower().replace('ё', 'е')):
+        if CYRILLIC.search(word):
+            stems.append(russian.stemWord(word))
+        else:
+            stems.append(english.stemWord(word))
+    return stems
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    russian = snowballstemmer.stemmer('russian')
+    english = snowballstemmer.stemmer('english')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "body, tokenize='unicode61 remove_diacritics 0', prefix='2 3')"
+        )
+        for pk, text in Post.objects.values_list('pk', 'text').iterator():
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, body) VALUES (%s, %s)',
+                [pk, ' '.join(stem_words(text, russian, english))],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -13,12 +16,28 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Посты вместе с автором и группой, которые выводит карточка."""
+        return self.select_related('author', 'group')
+
+    def with_comments(self):
+        """Подгружает комментарии вместе с их авторами одним запросом."""
+        return self.prefetch_related(models.Prefetch(
+            'comments',
+            queryset=Comment.objects.select_related('author'),
+        ))
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Содержание',
         help_text='Содержание поста'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    # Версия карточки поста для кеша фрагментов: меняется при каждом
+    # сохранении, поэтому старый фрагмент больше не находится.
+    updated = models.DateTimeField(auto_now=True)
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
@@ -36,17 +55,85 @@ class Post(models.Model):
     image = models.ImageField(
         'kartinka',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def image_sources(self):
+        """Варианты картинки для <picture>, сгруппированные по формату.
+
+        Форматы идут в порядке POST_IMAGE_FORMATS, последний из них
+        становится srcset у <img>. Пустой список, пока варианты не готовы.
+        """
+        by_format = {}
+        variants = sorted(self.variants.all(), key=lambda item: item.width)
+        for variant in variants:
+            by_format.setdefault(variant.format, []).append(variant)
+        sources = []
+        for image_format in settings.POST_IMAGE_FORMATS:
+            variants = by_format.get(image_format)
+            if not variants:
+                continue
+            sources.append({
+                'type': f'image/{image_format.lower()}',
+                'srcset': ', '.join(
+                    f'{variant.image.url} {variant.width}w'
+                    for variant in variants
+                ),
+                'src': variants[-1].image.url,
+            })
+        return sources
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста одной ширины в одном формате."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='variants',
+        verbose_name='Пост'
+    )
+    image = models.ImageField(
+        'Файл',
+        upload_to='variants/',
+    )
+    format = models.CharField('Формат', max_length=10)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    size = models.PositiveIntegerField('Байт')
+
+    class Meta:
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.format} {self.width}w'
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -68,6 +155,11 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -84,5 +176,74 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
     def __str__(self) -> str:
         return f'{self.user.username}-->{self.author.username}'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару читатель-пост."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые обновляются сигналами."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
@@ -0,0 +1,155 @@
+import base64
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по убыванию (pub_date, id) без COUNT и OFFSET.
+
+    Страница выбирается условием на ключ последней показанной записи,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = keys
+
+    def encode_cursor(self, obj):
+        raw = '|'.join(
+            getattr(obj, key).isoformat()
+            if hasattr(getattr(obj, key), 'isoformat')
+            else str(getattr(obj, key))
+            for key in self.keys
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            values = raw.split('|')
+            if len(values) != len(self.keys):
+                return None
+            opts = self.object_list.model._meta
+            return [
+                opts.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, ValidationError):
+            return None
+
+    def _seek(self, values, lookup):
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            step = Q(**{f'{key}__{lookup}': values[index]})
+            for prev_key, prev_value in zip(self.keys, values[:index]):
+                step &= Q(**{prev_key: prev_value})
+            condition |= step
+        return condition
+
+    def get_page(self, after=None, before=None):
+        descending = [f'-{key}' for key in self.keys]
+        after_values = after and self.decode_cursor(after)
+        before_values = before and self.decode_cursor(before)
+        window = self.per_page + 1
+        if before_values:
+            rows = list(
+                self.object_list
+                .filter(self._seek(before_values, 'gt'))
+                .order_by(*self.keys)[:window]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.object_list.order_by(*descending)
+            if after_values:
+                queryset = queryset.filter(self._seek(after_values, 'lt'))
+            rows = list(queryset[:window])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after_values)
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+def estimate_rows(model, using='default'):
+    """Примерное число строк таблицы без COUNT(*).
+
+    Берётся из sqlite_stat1, который заполняет ANALYZE, а без статистики
+    из MAX(pk): после удалений это оценка сверху. None, если база не
+    SQLite.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+            row = cursor.fetchone()
+        except DatabaseError:
+            row = None
+        if row:
+            return int(row[0].split()[0])
+        pk = model._meta.pk.column
+        cursor.execute(f'SELECT MAX("{pk}") FROM "{table}"')
+        return cursor.fetchone()[0] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц в админке.
+
+    Без фильтров число строк оценивается по статистике, с фильтрами
+    считается не дальше ESTIMATED_COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return queryset[:settings.ESTIMATED_COUNT_LIMIT].count()
@@ -0,0 +1,166 @@
+import re
+import threading
+from functools import lru_cache
+
+import snowballstemmer
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+
+_stemmers = threading.local()
+
+
+def stem_words(text):
+    """Слова текста в нижнем регистре, сведённые к основам Snowball.
+
+    Кириллица идёт через русский стеммер, остальное через английский.
+    Стеммеры snowballstemmer хранят состояние, поэтому свои у каждого
+    потока.
+    """
+    if not hasattr(_stemmers, 'russian'):
+        _stemmers.russian = snowballstemmer.stemmer('russian')
+        _stemmers.english = snowballstemmer.stemmer('english')
+    stems = []
+    for word in WORD.findall(text.lower().replace('ё', 'е')):
+        if CYRILLIC.search(word):
+            stems.append(_stemmers.russian.stemWord(word))
+        else:
+            stems.append(_stemmers.english.stemWord(word))
+    return stems
+
+
+def create_fts_table(cursor):
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        "body, tokenize='unicode61 remove_diacritics 0', prefix='2 3')"
+    )
+
+
+class SQLiteFTSEngine:
+    """Поиск по FTS5-таблице с основами слов, rowid в ней — id поста.
+
+    Запрос тоже сводится к основам, каждое слово ищется как префикс,
+    результаты упорядочены по bm25.
+    """
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, body) '
+                'VALUES (%s, %s)',
+                [post.pk, ' '.join(stem_words(post.text))],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self, posts):
+        """Заново заполняет индекс постами из posts, возвращает их число."""
+        indexed = 0
+        with connection.cursor() as cursor:
+            create_fts_table(cursor)
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            batch = []
+            for pk, text in posts.values_list('pk', 'text').iterator():
+                batch.append((pk, ' '.join(stem_words(text))))
+                if len(batch) == settings.POST_SEARCH_BATCH:
+                    indexed += self._insert(cursor, batch)
+                    batch = []
+            indexed += self._insert(cursor, batch)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+            )
+        return indexed
+
+    def _insert(self, cursor, batch):
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, body) VALUES (%s, %s)', batch
+        )
+        return len(batch)
+
+    def _match(self, query):
+        return ' '.join(f'"{term}"*' for term in stem_words(query))
+
+    def search(self, query, limit):
+        match = self._match(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, query):
+        """Все посты queryset по запросу: подзапрос к индексу, без лимита."""
+        match = self._match(query)
+        if not match:
+            return queryset.none()
+        meta = queryset.model._meta
+        # pk__in=RawSQL(...) в Django 2.2 даёт IN ((SELECT ...)), и SQLite
+        # берёт из подзапроса только первую строку.
+        return queryset.extra(
+            where=[
+                f'"{meta.db_table}"."{meta.pk.column}" IN (SELECT rowid '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        )
+
+
+class LikeEngine:
+    """Запасной поиск для баз без FTS5: LIKE по тексту, свежие первыми."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self, posts):
+        return 0
+
+    def search(self, query, limit):
+        query = query.strip()
+        if not query:
+            return []
+        return list(Post.objects.filter(
+            text__icontains=query
+        ).values_list('pk', flat=True)[:limit])
+
+    def filter(self, queryset, query):
+        query = query.strip()
+        if not query:
+            return queryset.none()
+        return queryset.filter(text__icontains=query)
+
+
+@lru_cache(maxsize=None)
+def _load_engine(path):
+    return import_string(path)()
+
+
+def get_engine():
+    """Движок поиска из POST_SEARCH_ENGINE."""
+    return _load_engine(settings.POST_SEARCH_ENGINE)
+
+
+def search_posts(query, limit=None):
+    """id постов по запросу в порядке релевантности."""
+    return get_engine().search(query, limit or settings.POST_SEARCH_LIMIT)
+
+
+def filter_posts(queryset, query):
+    """Посты queryset по запросу, без лимита и ранжирования."""
+    return get_engine().filter(queryset, query)
@@ -0,0 +1,196 @@
+"""Детерминированный синтетический набор данных для нагрузочных проверок.
+
+Все случайные решения берутся из одного random.Random(seed), поэтому
+одинаковые параметры дают одинаковую базу. Первичные ключи назначаются
+явно от текущего максимума таблицы. Пользователи и группы вставляются
+через bulk_create, а посты, комментарии и подписки, которых миллионы,
+кортежами через executemany: без моделей и сигналов это в разы быстрее.
+"""
+import datetime
+import itertools
+import random
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Max
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'кошка собака город река лес поезд письмо утро вечер дорога дом окно '
+    'книга песня море небо ветер снег дождь солнце друг работа музыка '
+    'чай хлеб сад мост поле гора звезда улица школа время память '
+    'красный тихий долгий новый старый быстрый тёплый холодный светлый '
+    'идти видеть думать писать читать ждать помнить любить знать'
+).split()
+START = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса 1/rank**exponent для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class SeedLoader:
+    def __init__(self, seed=0, batch_size=5000, start=START):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.start = start
+
+    def _first_pk(self, model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def _insert(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def _insert_rows(self, model, columns, rows):
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        inserted = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            inserted += len(batch)
+        return inserted
+
+    def _datetime(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def _text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def users(self, count):
+        first = self._first_pk(User)
+        self._insert(User, (
+            User(
+                pk=pk, username=f'seed{pk}', password='!',
+                date_joined=self.start,
+            )
+            for pk in range(first, first + count)
+        ))
+        return range(first, first + count)
+
+    def groups(self, count):
+        first = self._first_pk(Group)
+        self._insert(Group, (
+            Group(
+                pk=pk, title=f'Группа {pk}', slug=f'seed-{pk}',
+                description=self._text(12),
+            )
+            for pk in range(first, first + count)
+        ))
+        return range(first, first + count)
+
+    def images(self, count, size=(320, 240)):
+        """Имена count картинок из случайного шума, уже в хранилище."""
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for _ in range(count):
+            length = size[0] * size[1] * 3
+            # Random.randbytes есть только с Python 3.9.
+            pixels = self.random.getrandbits(length * 8).to_bytes(
+                length, 'little'
+            )
+            buffer = BytesIO()
+            Image.frombytes('RGB', size, pixels).save(buffer, 'JPEG')
+            names.append(storage.save(
+                'posts/seed.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def posts(self, count, users, groups, images=(), image_share=0.0,
+              exponent=1.1, step=datetime.timedelta(seconds=30)):
+        """Посты авторов с распределением активности по Ципфу.
+
+        Даты идут по возрастанию от start с шагом step, как у живого
+        сайта, где новые строки дописываются в конец таблицы.
+        """
+        first = self._first_pk(Post)
+        authors = list(users)
+        weights = zipf_weights(len(authors), exponent)
+        self.random.shuffle(authors)
+
+        def build():
+            for number in range(count):
+                pub_date = self._datetime(self.start + step * number)
+                image = ''
+                if images and self.random.random() < image_share:
+                    image = self.random.choice(images)
+                group = None
+                if groups and self.random.random() < 0.7:
+                    group = self.random.choice(groups)
+                author = self.random.choices(authors, cum_weights=weights)[0]
+                text = self._text(self.random.randint(5, 60))
+                yield (
+                    first + number, text, pub_date, pub_date, group, author,
+                    image, 0,
+                )
+        self._insert_rows(Post, (
+            'id', 'text', 'pub_date', 'updated', 'group_id', 'author_id',
+            'image', 'comments_count',
+        ), build())
+        return range(first, first + count)
+
+    def follows(self, users, average, exponent=1.0):
+        """Граф подписок со степенным распределением числа подписчиков.
+
+        Каждый подписывается в среднем на average авторов, а автора
+        выбирают с весом 1/rank**exponent, поэтому у немногих авторов
+        подписчиков очень много, а у большинства почти нет.
+        """
+        authors = list(users)
+        weights = zipf_weights(len(authors), exponent)
+        self.random.shuffle(authors)
+        limit = len(authors) - 1
+
+        def build():
+            for user in users:
+                wanted = min(
+                    int(self.random.expovariate(1 / average)), limit
+                ) if average else 0
+                chosen = set()
+                while len(chosen) < wanted:
+                    author = self.random.choices(
+                        authors, cum_weights=weights
+                    )[0]
+                    if author != user:
+                        chosen.add(author)
+                for author in sorted(chosen):
+                    yield user, author
+        return self._insert_rows(Follow, ('user_id', 'author_id'), build())
+
+    def comments(self, count, users, posts):
+        if not users or not posts:
+            return 0
+
+        def build():
+            for number in range(count):
+                created = self.start + datetime.timedelta(minutes=number)
+                yield (
+                    self.random.choice(posts),
+                    self.random.choice(users),
+                    self._text(self.random.randint(2, 20)),
+                    self._datetime(created),
+                )
+        return self._insert_rows(
+            Comment, ('post_id', 'author_id', 'text', 'created'), build()
+        )
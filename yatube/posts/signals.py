@@ -0,0 +1,128 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_migrate, post_save
+)
+from django.dispatch import receiver
+
+from .cache import bump_listing_version
+from .counters import bump_comments, bump_user
+from .models import (
+    Comment, Follow, Group, Post, PostImageVariant, User, UserCounters
+)
+from .search import get_engine
+from .thumbnail_gc import release_image
+from .timeline import fan_out_post
+
+
+@receiver(post_save, sender=Post)
+def post_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_engine().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_engine().remove(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user(instance.user_id, 'following_count', 1)
+        bump_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user(instance.user_id, 'following_count', -1)
+    bump_user(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_listings(sender, **kwargs):
+    bump_listing_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_listings(sender, update_fields=None, **kwargs):
+    # Вход меняет только last_login, а его страницы не показывают.
+    if update_fields != frozenset({'last_login'}):
+        bump_listing_version()
+
+
+@receiver(post_migrate)
+def clear_cache(sender, **kwargs):
+    # Кеш в файлах переживает процессы: страницы, собранные до миграций
+    # и нового кода, отдавать нельзя.
+    if sender.name == 'posts':
+        cache.clear()
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw=False, **kwargs):
+    old_image = instance._loaded_image
+    instance._loaded_image = instance.image.name
+    if created or raw:
+        return
+    if old_image and old_image != instance.image.name:
+        # Варианты прежней картинки показывали бы её и дальше.
+        instance.variants.all().delete()
+        transaction.on_commit(lambda: release_image(old_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_delete, sender=PostImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    storage, name = instance.image.storage, instance.image.name
+    transaction.on_commit(lambda: storage.delete(name))
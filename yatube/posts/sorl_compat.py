@@ -0,0 +1,107 @@
+"""Обращения к внутренностям sorl-thumbnail, без которых нет prefetch.
+
+Публичного способа узнать имя превью, не строя его, у sorl нет: имя
+считают закрытые методы ThumbnailBackend. Все такие обращения собраны
+здесь и проверены на версиях с мажорной TESTED_MAJOR. На другой версии
+или без нужных методов SUPPORTED ложно, и prefetch_thumbnails оставляет
+превью тегу thumbnail.
+
+Пачкой kvstore читается, только если это CachedDB из sorl: get_many из
+кеша и один запрос в базу за промахами. Другие kvstore читаются через
+публичный get, по одному обращению к хранилищу на пост.
+"""
+import logging
+
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+logger = logging.getLogger(__name__)
+
+TESTED_MAJOR = 12
+_PRIVATE_METHODS = ('_get_format', '_get_thumbnail_filename')
+
+
+def _installed_version():
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python 3.7
+        return None
+    try:
+        return version('sorl-thumbnail')
+    except PackageNotFoundError:
+        return None
+
+
+def _is_supported(installed):
+    if installed is not None and (
+        installed.split('.')[0] != str(TESTED_MAJOR)
+    ):
+        return False
+    return all(
+        callable(getattr(ThumbnailBackend, name, None))
+        for name in _PRIVATE_METHODS
+    )
+
+
+VERSION = _installed_version()
+SUPPORTED = _is_supported(VERSION)
+if not SUPPORTED:
+    logger.warning(
+        'sorl-thumbnail %s не проверен с prefetch_thumbnails, превью '
+        'строит тег thumbnail', VERSION or '(версия неизвестна)'
+    )
+
+
+def thumbnail_file(source, geometry, options):
+    """Файл превью с тем же именем, что даст ThumbnailBackend."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def get_many(thumbnails):
+    """Возвращает {ключ превью: ImageFile} для уже построенных превью."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        found = {}
+        for thumbnail in thumbnails:
+            cached = kvstore.get(thumbnail)
+            if cached:
+                found[thumbnail.key] = cached
+        return found
+    keys = {
+        add_prefix(thumbnail.key): thumbnail.key for thumbnail in thumbnails
+    }
+    raw = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in raw]
+    if missing:
+        from_db = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        # Как и sorl, запоминаем промахи, чтобы не ходить за ними в базу.
+        kvstore.cache.set_many(
+            {key: from_db.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        raw.update(from_db)
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in raw.items()
+        if value and value != EMPTY_VALUE
+    }
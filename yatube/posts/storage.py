@@ -0,0 +1,50 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CONTENT_NAME = re.compile(r'(?:[0-9a-f]+/)*(?P<digest>[0-9a-f]{64})(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Файлы раскладываются по вложенным папкам из первых символов хеша,
+    например posts/3a/7f/3a7f….jpg, а одинаковые байты пишутся один раз:
+    повторная загрузка получает имя уже лежащего файла.
+    """
+
+    def __init__(self, depth=2, width=2, **kwargs):
+        super().__init__(**kwargs)
+        self.depth = depth
+        self.width = width
+
+    def content_name(self, name, content):
+        """Имя файла по содержимому, в той же папке, что и name."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        shards = [
+            digest[level * self.width:(level + 1) * self.width]
+            for level in range(self.depth)
+        ]
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), *shards, digest + extension
+        )
+
+    def is_content_name(self, name):
+        """Лежит ли файл уже под именем из своего хеша."""
+        return CONTENT_NAME.search(name) is not None
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
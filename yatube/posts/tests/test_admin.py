@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.groups = [
+            Group.objects.create(title=f'g{number}', slug=f'g{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count):
+        for number in range(count):
+            Post.objects.create(
+                author=self.admin,
+                group=self.groups[number % 3],
+                text='длинный текст ' * 20,
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.create_posts(2)
+        few, _ = self.count_queries()
+        self.create_posts(20)
+        many, response = self.count_queries()
+        self.assertEqual(few, many)
+        self.assertContains(response, 'длинный текст')
+        self.assertNotContains(response, 'длинный текст ' * 20)
+        # В каждой строке в <select> только её собственная группа.
+        self.assertContains(
+            response,
+            f'<option value="{self.groups[2].pk}"',
+            count=Post.objects.filter(group=self.groups[2]).count(),
+        )
+
+    @override_settings(POST_SEARCH_LIMIT=1)
+    def test_search_is_not_cut_by_limit(self):
+        self.create_posts(3)
+        Post.objects.create(author=self.admin, text='другое')
+        response = self.client.get(self.url, {'q': 'длинного'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_reassign_group_action(self):
+        self.create_posts(5)
+        posts = Post.objects.filter(group=self.groups[0])
+        selected = list(posts.values_list('pk', flat=True))
+        self.client.post(self.url, {
+            'action': 'reassign_group',
+            'group': self.groups[1].slug,
+            ACTION_CHECKBOX_NAME: selected,
+        })
+        self.assertFalse(posts.exists())
+        self.assertEqual(
+            Post.objects.filter(pk__in=selected, group=self.groups[1]).count(),
+            len(selected),
+        )
+
+    def test_reassign_group_fits_query_params_limit(self):
+        self.create_posts(12)
+        selected = list(Post.objects.values_list('pk', flat=True))
+        features = mock.patch.object(
+            connection.features, 'max_query_params', 5
+        )
+        with features, CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {
+                'action': 'reassign_group',
+                'group': self.groups[1].slug,
+                ACTION_CHECKBOX_NAME: selected,
+            })
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        # По три id на UPDATE: ещё два параметра — группа и время.
+        self.assertEqual(len(updates), 4)
+        self.assertEqual(
+            Post.objects.filter(group=self.groups[1]).count(), 12
+        )
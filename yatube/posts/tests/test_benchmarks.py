@@ -0,0 +1,71 @@
+import threading
+import tracemalloc
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Template
+from django.test import TestCase
+
+from core import instrumentation
+from core.instrumentation import measure
+
+from ..benchmarks import compare, run_benchmarks
+from ..models import Post, User
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_load', '--users', '20', '--groups', '2', '--posts', '60',
+            '--comments', '20', '--follows', '3', '--no-search',
+            stdout=StringIO(),
+        )
+
+    def test_measure_counts_queries_and_render(self):
+        with measure(memory=True) as measurement:
+            list(User.objects.all())
+            self.client.get('/')
+        self.assertGreater(measurement.queries, 1)
+        self.assertGreater(measurement.render_time, 0)
+        self.assertGreater(measurement.as_dict()['peak_kb'], 0)
+
+    def test_memory_without_reset_peak(self):
+        # Как на Python 3.7 и 3.8, где tracemalloc.reset_peak нет.
+        legacy = mock.Mock(
+            spec=['is_tracing', 'start', 'stop', 'get_traced_memory'],
+            wraps=tracemalloc,
+        )
+        with mock.patch.object(instrumentation, 'tracemalloc', legacy):
+            with measure(memory=True) as measurement:
+                list(User.objects.all())
+        self.assertGreater(measurement.peak_memory, 0)
+
+    def test_hooks_count_only_the_measured_thread(self):
+        self.assertIs(Template.render, instrumentation._timed_render)
+        with measure() as measurement:
+            other = threading.Thread(target=cache.get, args=('other',))
+            other.start()
+            other.join()
+            cache.get('own')
+        self.assertIs(Template.render, instrumentation._timed_render)
+        self.assertEqual(measurement.cache_misses, 1)
+
+    def test_every_view_is_measured(self):
+        results = run_benchmarks(repeat=1, memory=False)
+        self.assertEqual(set(results), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'add_comment',
+        })
+        self.assertGreater(results['index']['queries'], 0)
+        self.assertTrue(Post.objects.filter(comments__text__contains='бенч'))
+
+    def test_compare_flags_only_real_regressions(self):
+        baseline = {'index': {'wall_ms': 10.0, 'queries': 4}}
+        current = {'index': {'wall_ms': 10.5, 'queries': 6}}
+        self.assertEqual(
+            compare(baseline, current, 0.2), [('index', 'queries', 4, 6)]
+        )
@@ -0,0 +1,184 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import _create_cache, cache, caches
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import SharedFileCache
+
+from .. import cache as listing_cache
+from ..cache import (
+    bump_listing_version, listing_cache_key, listing_timeout,
+    listing_version
+)
+from ..models import Follow, Group, Post, User
+
+
+class ListingCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cache')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cache', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+
+    def test_listing_is_served_from_cache(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+
+    def test_write_invalidates_listing(self):
+        for url in self.urls:
+            self.client.get(url)
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='свежий пост'
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), post.text)
+        post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), post.text)
+
+    def test_stale_copy_while_other_request_rebuilds(self):
+        url = reverse('posts:index')
+        post = Post.objects.create(author=self.user, text='старый текст')
+        self.client.get(url)
+        request = RequestFactory().get(url)
+        request.user = AnonymousUser()
+        key = listing_cache_key(request)
+        _, response = cache.get(key)
+        cache.set(key, (0, response))
+        Post.objects.filter(pk=post.pk).update(
+            text='новый текст', updated=timezone.now()
+        )
+        cache.add(f'{key}:lock', 1)
+        self.assertContains(self.client.get(url), 'старый текст')
+        cache.delete(f'{key}:lock')
+        self.assertContains(self.client.get(url), 'новый текст')
+
+    def test_previous_render_after_write_while_other_request_rebuilds(self):
+        url = reverse('posts:index')
+        Post.objects.create(author=self.user, text='старый текст')
+        self.client.get(url)
+        Post.objects.create(author=self.user, text='новый текст')
+        request = RequestFactory().get(url)
+        request.user = AnonymousUser()
+        key = listing_cache_key(request)
+        cache.add(f'{key}:lock', 1)
+        with mock.patch.object(listing_cache.time, 'sleep') as sleep:
+            response = self.client.get(url)
+        sleep.assert_not_called()
+        self.assertNotContains(response, 'новый текст')
+        cache.delete(f'{key}:lock')
+        self.assertContains(self.client.get(url), 'новый текст')
+
+
+class SharedVersionTests(TestCase):
+    """Версия списков общая для процессов с отдельными объектами кеша."""
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.workers = [
+            _create_cache('core.cache.SharedFileCache', LOCATION=location)
+            for _ in range(2)
+        ]
+
+    def as_worker(self, number):
+        return mock.patch.object(
+            listing_cache, 'cache', self.workers[number]
+        )
+
+    def test_bump_in_one_worker_is_seen_by_another(self):
+        with self.as_worker(0):
+            before = listing_version()
+        with self.as_worker(1):
+            bump_listing_version()
+            bump_listing_version()
+        with self.as_worker(0):
+            self.assertEqual(listing_version(), before + 2)
+
+    def test_lock_is_taken_by_one_worker(self):
+        first, second = self.workers
+        self.assertTrue(first.add('lock', 1, 10))
+        self.assertFalse(second.add('lock', 2, 10))
+        self.assertEqual(second.get('lock'), 1)
+        first.delete('lock')
+        self.assertTrue(second.add('lock', 2, 10))
+
+    def test_expired_lock_is_taken_again(self):
+        first, second = self.workers
+        first.add('lock', 1, 10)
+        with mock.patch('time.time', return_value=time.time() + 60):
+            self.assertTrue(second.add('lock', 2, 10))
+
+    def test_long_timeout_only_for_shared_backend(self):
+        self.assertIsInstance(caches['default'], SharedFileCache)
+        self.assertEqual(listing_timeout(), settings.LISTING_CACHE_TIMEOUT)
+        locmem = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }}
+        with self.settings(CACHES=locmem):
+            self.assertEqual(
+                listing_timeout(), settings.LISTING_CACHE_LOCAL_TIMEOUT
+            )
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.reader = User.objects.create_user(username='card_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_index_reuses_cards_until_edit(self):
+        post = Post.objects.create(author=self.author, text='карточка')
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=post.pk).update(text='без сигналов')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'карточка')
+        post.text = 'исправлено'
+        post.save()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'исправлено')
+
+    def test_card_follows_author_and_group_edits(self):
+        author = User.objects.create_user(username='old_name')
+        Follow.objects.create(user=self.reader, author=author)
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.create(author=author, group=group, text='пост')
+        self.client.get(reverse('posts:follow_index'))
+        group.slug = 'new-slug'
+        group.save()
+        author.username = 'new_name'
+        author.save()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, '/group/new-slug/')
+        self.assertContains(response, '/profile/new_name/')
+        self.assertNotContains(response, 'old_name')
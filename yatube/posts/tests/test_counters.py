@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserCounters
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(author=self.author, text='пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='к'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_repair_command(self):
+        post = Post.objects.create(author=self.author, text='пост')
+        Comment.objects.create(post=post, author=self.reader, text='к')
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('repair_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertTrue(UserCounters.objects.filter(user=self.reader).exists())
+
+    def test_pages_restore_missing_counters(self):
+        post = Post.objects.create(author=self.author, text='пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounters.objects.filter(user=self.author).delete()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        UserCounters.objects.filter(user=self.author).delete()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters(self.author).posts_count, 1)
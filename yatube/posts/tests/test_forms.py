@@ -1,14 +1,21 @@
+import hashlib
+import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post, User, Follow
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Тег EXIF Orientation: 6 — кадр снят повёрнутым на 90° по часовой.
+ORIENTATION = 0x0112
 small_gif = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -17,6 +24,12 @@ small_gif = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+# Картинки постов лежат под именем из sha256 содержимого.
+small_gif_digest = hashlib.sha256(small_gif).hexdigest()
+small_gif_name = (
+    f'posts/{small_gif_digest[:2]}/{small_gif_digest[2:4]}/'
+    f'{small_gif_digest}.gif'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -74,7 +87,7 @@ class TestContextImage(TestCase):
             post_in_page.text: TestContextImage.post.text,
             post_in_page.group: TestContextImage.group,
             post_in_page.author: TestContextImage.user1,
-            post_in_page.image.name: 'posts/small.gif',
+            post_in_page.image.name: small_gif_name,
         }
         for var, res in test_var.items():
             with self.subTest(res=res):
@@ -228,3 +241,80 @@ class TestContextImage(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(self.post.comments.count(), 0)
+
+
+def png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'white').save(buffer, 'PNG')
+    return SimpleUploadedFile('big.png', buffer.getvalue(), 'image/png')
+
+
+def jpeg(width, height, orientation=1):
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'white').save(
+        buffer, 'JPEG', exif=exif.tobytes()
+    )
+    return SimpleUploadedFile('big.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='ingest'))
+
+    def create(self, image):
+        return self.client.post(
+            reverse('posts:post_create'), {'text': 'фото', 'image': image}
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=400)
+    def test_large_original_is_downscaled(self):
+        self.create(png(1200, 600))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (400, 200))
+
+    @override_settings(
+        POST_IMAGE_MAX_SIDE=400, POST_IMAGE_MAX_DECODE_PIXELS=1000 * 1000
+    )
+    def test_only_jpeg_is_decoded_reduced(self):
+        response = self.create(png(2400, 1200))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком большая: уменьшите её до 1 Мп.'
+        )
+        self.create(jpeg(2400, 1200))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (400, 200))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=400)
+    def test_downscaled_jpeg_keeps_exif_orientation(self):
+        self.create(jpeg(1200, 600, orientation=6))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (200, 400))
+        with Image.open(post.image.path) as image:
+            self.assertNotIn(ORIENTATION, image.getexif())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_decompression_bomb_is_rejected(self):
+        response = self.create(png(200, 200))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_header_is_enough_for_small_image(self):
+        image = png(300, 100)
+        load = mock.patch.object(
+            Image.Image, 'load', side_effect=AssertionError
+        )
+        with load:
+            self.create(image)
+        self.assertTrue(Post.objects.exists())
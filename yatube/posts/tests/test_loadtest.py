@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from ..loadtest import (
+    LOCK_HEADER, Recorder, _remember_exception, mark_locked, run_load,
+    summarize,
+)
+
+
+class ReportTests(SimpleTestCase):
+    def test_percentiles_per_url_name(self):
+        recorder = Recorder()
+        for number in range(1, 101):
+            recorder.add('posts:index', number / 1000, number > 98, False)
+        recorder.add('posts:add_comment', 0.5, True, True)
+        report = summarize(recorder, elapsed=10)
+        index = report['posts:index']
+        self.assertEqual(
+            (index['p50_ms'], index['p95_ms'], index['p99_ms']),
+            (50.0, 95.0, 99.0),
+        )
+        self.assertEqual(index['error_rate'], 0.02)
+        self.assertEqual(report['posts:add_comment']['locked'], 1)
+        self.assertEqual(report['total']['requests'], 101)
+        self.assertEqual(report['total']['rps'], 10.1)
+
+    def test_locked_response_is_marked(self):
+        def app(environ, start_response):
+            try:
+                raise OperationalError('database is locked')
+            except OperationalError:
+                got_request_exception.send(sender=None)
+            start_response('500 Internal Server Error', [])
+            return [b'']
+
+        got_request_exception.connect(_remember_exception)
+        self.addCleanup(
+            got_request_exception.disconnect, _remember_exception
+        )
+        headers = []
+        mark_locked(app)({}, lambda status, sent, exc_info=None: (
+            headers.extend(sent)
+        ))
+        self.assertIn((LOCK_HEADER, '1'), headers)
+
+
+class LoadRunTests(LiveServerTestCase):
+    def setUp(self):
+        call_command(
+            'seed_load', '--users', '10', '--groups', '2', '--posts', '40',
+            '--comments', '10', '--follows', '2', '--no-search',
+            stdout=StringIO(),
+        )
+
+    def test_mixed_scenarios_without_errors(self):
+        report = run_load(
+            self.live_server_url, duration=1, rps=30, concurrency=1,
+            mix={'browse': 1, 'feed': 1, 'follow': 1, 'comment': 1},
+        )
+        self.assertGreater(report['total']['requests'], 10)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertIn('posts:index', report)
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import Registry, registry
+
+from ..models import Post, User
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='metrics')
+        Post.objects.create(author=cls.user, text='пост')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        registry.reset()
+        cache.clear()
+
+    def test_views_are_recorded_per_url_name(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 2', body
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            body,
+        )
+        self.assertIn('yatube_cache_hits_total{view="posts:index"} ', body)
+        self.assertIn(
+            'yatube_sql_queries_bucket{view="posts:index",le="+Inf"} 2', body
+        )
+        counts = registry.snapshot()['counters']
+        labels = 'view="posts:index"'
+        self.assertGreaterEqual(counts['yatube_cache_hits_total'][labels], 1)
+        self.assertGreaterEqual(
+            counts['yatube_cache_misses_total'][labels], 1
+        )
+
+    def test_other_processes_are_summed(self):
+        other = Registry()
+        other._inc('yatube_requests_total', 'view="posts:index",status="200"')
+        other._observe(
+            'yatube_sql_queries', 'view="posts:index"', 4
+        )
+        with open(os.path.join(self.directory, 'other.json'), 'w') as out:
+            json.dump(other.snapshot(), out)
+        self.client.get(reverse('posts:index'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 2', body
+        )
+        self.assertIn('yatube_sql_queries_count{view="posts:index"} 2', body)
+
+    def test_endpoint_is_closed_for_strangers(self):
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client.get(reverse('metrics')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        client.force_login(self.user)
+        self.assertEqual(client.get(reverse('metrics')).status_code, 200)
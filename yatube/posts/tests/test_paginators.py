@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+
+
+@override_settings(CURSOR_PAGINATION=True, PAGE_VOL=3)
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        for number in range(7):
+            Post.objects.create(author=cls.user, text=f'пост {number}')
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_page(self, **params):
+        return self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            params,
+        ).context['page_obj']
+
+    def test_walk_forward_and_back(self):
+        first = self.get_page()
+        self.assertEqual(list(first), self.expected[:3])
+        self.assertFalse(first.has_previous())
+        second = self.get_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.expected[3:6])
+        last = self.get_page(after=second.next_cursor)
+        self.assertEqual(list(last), self.expected[6:])
+        self.assertFalse(last.has_next())
+        back = self.get_page(before=last.previous_cursor)
+        self.assertEqual(list(back), self.expected[3:6])
+        back = self.get_page(before=back.previous_cursor)
+        self.assertEqual(list(back), self.expected[:3])
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        page = self.get_page(after='не-курсор')
+        self.assertEqual(list(page), self.expected[:3])
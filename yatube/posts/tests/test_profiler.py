@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiler import list_reports, make_token
+
+from ..models import Post, User
+
+
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.create(author=cls.user, text='пост')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(PROFILER_DIR=directory, PROFILER_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def test_report_has_stacks_and_sql_timeline(self):
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_PROFILE=make_token(self.staff)
+        )
+        name = response['X-Profile-Id']
+        report = self.client.get(
+            reverse('profile_report', kwargs={'name': name})
+        ).json()
+        self.assertEqual(report['view'], 'posts:index')
+        self.assertTrue(report['sql'])
+        self.assertLessEqual(
+            report['sql'][-1]['start_ms'], report['wall_ms']
+        )
+        folded = self.client.get(
+            reverse('profile_report', kwargs={'name': name}),
+            {'format': 'folded'},
+        ).content.decode()
+        for line in folded.splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(count.isdigit())
+
+    def test_ring_buffer_keeps_latest(self):
+        token = make_token(self.staff)
+        names = [
+            self.client.get(
+                reverse('posts:index'), {'_profile': token}
+            )['X-Profile-Id']
+            for _ in range(3)
+        ]
+        self.assertEqual(list_reports(), names[:0:-1])
+
+    def test_token_is_personal_and_for_staff_only(self):
+        call_command('profile_token', 'staff', stdout=StringIO())
+        token = make_token(self.staff)
+        guest = Client()
+        guest.force_login(self.user)
+        self.assertNotIn('X-Profile-Id', guest.get(
+            reverse('posts:index'), {'_profile': token}
+        ))
+        self.assertNotIn('X-Profile-Id', self.client.get(
+            reverse('posts:index'), {'_profile': token + 'x'}
+        ))
+        self.assertNotEqual(
+            guest.get(reverse('profiles')).status_code, 200
+        )
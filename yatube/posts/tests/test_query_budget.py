@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import URLPattern
+
+from core import query_budget as budget
+from core.query_budget import QueryBudgetExceeded, collect, query_budget
+
+from ..models import Comment, Post, User
+from ..urls import urlpatterns
+
+COMMENTS = Template(
+    '{% for comment in comments %}{{ comment.author.username }}'
+    '{% endfor %}'
+)
+
+
+@query_budget(2)
+def comments_view(request):
+    comments = Comment.objects.all()
+    return HttpResponse(COMMENTS.render(Context({'comments': comments})))
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        post = Post.objects.create(
+            author=User.objects.create_user(username='author'), text='пост'
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=post, text='к',
+                author=User.objects.create_user(username=f'reader{number}'),
+            )
+            for number in range(3)
+        )
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def without_collectors(self):
+        # Под pytest-плагином тест сам идёт внутри collect().
+        return mock.patch.object(budget, '_collectors', [])
+
+    def test_report_points_at_duplicated_sql_in_template(self):
+        with collect() as violations:
+            comments_view(self.request)
+        violation, = violations
+        self.assertEqual(len(violation.queries), 4)
+        (sql, count, places), = violation.duplicates()
+        self.assertIn('auth_user', sql)
+        self.assertEqual(count, 3)
+        self.assertEqual(places[0][0], 'шаблон <unknown source>:1')
+        self.assertIn('comments_view', str(violation))
+
+    @override_settings(DEBUG=True, QUERY_BUDGET_ACTION='raise')
+    def test_debug_raises(self):
+        with self.without_collectors(), \
+                self.assertRaises(QueryBudgetExceeded):
+            comments_view(self.request)
+
+    @override_settings(DEBUG=True)
+    def test_debug_logs_by_default(self):
+        with self.without_collectors(), \
+                self.assertLogs('core.query_budget') as logs:
+            comments_view(self.request)
+        self.assertEqual(len(logs.records), 1)
+
+    def test_every_posts_view_has_budget(self):
+        for pattern in urlpatterns:
+            if isinstance(pattern, URLPattern):
+                with self.subTest(view=pattern.name):
+                    self.assertTrue(hasattr(pattern.callback, 'query_budget'))
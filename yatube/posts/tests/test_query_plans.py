@@ -0,0 +1,96 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import repair_counters
+from ..models import Comment, Follow, Group, Post, User
+from ..timeline import rebuild_timelines
+
+USERS = 60
+GROUPS = 12
+POSTS = 3000
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+
+
+class QueryPlanTests(TestCase):
+    """Списки постов читаются по индексам, без полного скана и сортировки.
+
+    На заполненной базе снимаем EXPLAIN QUERY PLAN для каждого SELECT,
+    который выполняет страница, и ищем в плане SCAN без индекса и
+    USE TEMP B-TREE.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(USERS)
+        )
+        Group.objects.bulk_create(
+            Group(title=f'g{number}', slug=f'g{number}', description='')
+            for number in range(GROUPS)
+        )
+        users = list(User.objects.order_by('pk'))
+        groups = list(Group.objects.order_by('pk'))
+        Post.objects.bulk_create(
+            Post(
+                author=users[number % USERS],
+                group=groups[number % GROUPS] if number % 3 else None,
+                text=f'пост {number}',
+            )
+            for number in range(POSTS)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=user, text='к') for user in users
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author) for author in users[:20]
+        )
+        rebuild_timelines()
+        repair_counters()
+        cls.author = users[0]
+        cls.group = groups[1]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    with self.subTest(url=url, sql=sql, plan=detail):
+                        self.assertNotIn('USE TEMP B-TREE', detail)
+                        self.assertIsNone(FULL_SCAN.match(detail))
+
+    def test_listing_plans(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=50',
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.author.username
+            }),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
+
+    def test_listing_plans_with_cursor(self):
+        with self.settings(CURSOR_PAGINATION=True):
+            self.test_listing_plans()
@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import search_posts, stem_words
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Кошки спят на тёплой крыше'
+        )
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Кошка и кошки, кошками полон двор'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Собаки лают во дворе'
+        )
+
+    def test_stemming_matches_word_forms(self):
+        self.assertEqual(stem_words('Кошками'), stem_words('кошки'))
+        self.assertEqual(stem_words('Ёжик'), stem_words('ежик'))
+        self.assertEqual(
+            set(search_posts('кошкой')), {self.cats.pk, self.cat.pk}
+        )
+
+    def test_results_are_ranked(self):
+        self.assertEqual(search_posts('кошки')[0], self.cat.pk)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(author=self.author, text='Лисы в норе')
+        post.text = 'Коты в норе'
+        post.save()
+        self.assertEqual(search_posts('лиса'), [])
+        self.assertEqual(search_posts('кот'), [post.pk])
+        post.delete()
+        self.assertEqual(search_posts('кот'), [])
+
+    def test_search_page(self):
+        response = Client().get(reverse('posts:search'), {'q': 'двор'})
+        self.assertEqual(
+            set(response.context['page_obj']), {self.cat, self.dogs}
+        )
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search_posts('лают'), [self.dogs.pk])
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..seeding import SeedLoader
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class SeedLoadTests(TestCase):
+    def seed(self, seed=7):
+        call_command(
+            'seed_load', '--users', '40', '--groups', '3', '--posts', '200',
+            '--comments', '50', '--follows', '5', '--seed', str(seed),
+            '--batch-size', '64', stdout=StringIO(),
+        )
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date'
+            )),
+            list(Follow.objects.order_by('user__username', 'author__username')
+                 .values_list('user__username', 'author__username')),
+        )
+
+    def test_counts_and_derived_data(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')
+        ).exists())
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_followers_are_skewed(self):
+        self.seed()
+        followers = sorted(
+            User.objects.annotate(total=Count('following'))
+            .values_list('total', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], 4 * followers[len(followers) // 2])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_images_depend_only_on_seed(self):
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        first = SeedLoader(seed=3).images(2, size=(16, 8))
+        self.assertEqual(SeedLoader(seed=3).images(2, size=(16, 8)), first)
+        self.assertNotEqual(first[0], first[1])
@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.slowlog import BackgroundHandler
+
+from ..models import Post, User
+
+LOGGER = 'yatube.slow_requests'
+
+
+class SlowRequestLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='slow')
+        Post.objects.create(author=cls.user, text='пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs(LOGGER) as logs:
+            self.client.get(reverse('posts:index'))
+        record = logs.records[0].msg
+        self.assertEqual(record['reason'], 'slow')
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['user_id'], self.user.pk)
+        self.assertEqual(len(record['sql']), record['sql_count'])
+        self.assertGreater(record['cache']['misses'], 0)
+        self.assertIn('thumbnail_ms', record)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=60, SLOW_QUERY_THRESHOLD=60)
+    def test_fast_requests_are_sampled(self):
+        with self.settings(SLOW_REQUEST_SAMPLE_RATE=1), \
+                self.assertLogs(LOGGER) as logs:
+            self.client.get(reverse('about:author'))
+        self.assertEqual(logs.records[0].msg['reason'], 'sample')
+        logger = logging.getLogger(LOGGER)
+        with self.settings(SLOW_REQUEST_SAMPLE_RATE=0), \
+                self.assertLogs(LOGGER) as logs:
+            self.client.get(reverse('posts:index'))
+            logger.info('маркер')
+        self.assertEqual(len(logs.records), 1)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_other_urls_are_not_logged(self):
+        logger = logging.getLogger(LOGGER)
+        with self.assertLogs(LOGGER) as logs:
+            response = self.client.get(reverse('metrics'))
+            logger.info('маркер')
+        self.assertEqual(len(logs.records), 1)
+        measurement = response.wsgi_request.slow_request_measurement
+        self.assertIsNone(measurement.statements)
+
+
+class BackgroundHandlerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'slow.jsonl')
+
+    def record(self, message):
+        return logging.LogRecord(
+            LOGGER, logging.INFO, __file__, 1, message, None, None
+        )
+
+    def test_writes_json_lines_from_thread(self):
+        handler = BackgroundHandler(self.path)
+        handler.handle(self.record({'view': 'posts:index', 'ms': 1.5}))
+        handler.close()
+        with open(self.path) as log:
+            self.assertEqual(
+                [json.loads(line) for line in log],
+                [{'view': 'posts:index', 'ms': 1.5}],
+            )
+
+    def test_full_queue_drops_records(self):
+        handler = BackgroundHandler(self.path, maxsize=1)
+        handler.close()
+        handler.handle(self.record({}))
+        handler.handle(self.record({}))
+        self.assertEqual(handler.dropped, 1)
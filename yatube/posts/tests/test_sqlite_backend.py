@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase
+
+from core.db.maintenance import enable_incremental_vacuum, run_maintenance
+from core.db.sqlite3.base import DatabaseWrapper
+
+
+def pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+class SQLiteBackendTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+
+    def file_wrapper(self, **options):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': options,
+        }, 'file')
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def test_pragmas_applied(self):
+        self.assertEqual(pragma(connection, 'synchronous'), 1)
+        self.assertEqual(pragma(connection, 'busy_timeout'), 20000)
+        self.assertEqual(pragma(connection, 'cache_size'), -64 * 1024)
+        wrapper = self.file_wrapper(pragmas={'busy_timeout': 50})
+        self.assertEqual(pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(pragma(wrapper, 'busy_timeout'), 50)
+        self.assertEqual(pragma(wrapper, 'mmap_size'), 256 * 1024 * 1024)
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        first = self.file_wrapper()
+        second = self.file_wrapper(pragmas={'busy_timeout': 0})
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer)')
+        # Так транзакцию начинает atomic().
+        first.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True
+        )
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            second.cursor().execute('INSERT INTO item VALUES (1)')
+        first.rollback()
+        first.set_autocommit(True)
+
+    def test_broken_connection_closed(self):
+        wrapper = self.file_wrapper()
+        wrapper.settings_dict['CONN_MAX_AGE'] = 600
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNotNone(wrapper.connection)
+        wrapper.connection.close()
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
+
+    def test_maintenance(self):
+        wrapper = self.file_wrapper()
+        self.assertTrue(enable_incremental_vacuum(wrapper))
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (data text)')
+            cursor.executemany(
+                'INSERT INTO item VALUES (?)', [('x' * 1000,)] * 200
+            )
+            cursor.execute('DELETE FROM item')
+        report = run_maintenance(wrapper, analysis_limit=100)
+        self.assertGreater(report['free_pages'], 0)
+        self.assertEqual(report['vacuumed_pages'], report['free_pages'])
+        self.assertEqual(pragma(wrapper, 'freelist_count'), 0)
+
+    def test_command(self):
+        output = StringIO()
+        call_command('db_maintenance', stdout=output)
+        self.assertIn('Страниц:', output.getvalue())
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post, User
+from .test_forms import small_gif, small_gif_digest, small_gif_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='storage')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.author,
+            text='картинка',
+            image=SimpleUploadedFile(name, small_gif, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, small_gif_name)
+        self.assertEqual(second.image.name, small_gif_name)
+        shard = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(shard), [f'{small_gif_digest}.gif'])
+
+    def test_migrate_media_rewrites_flat_paths(self):
+        FileSystemStorage().save('posts/old.gif', ContentFile(small_gif))
+        post = Post.objects.create(
+            author=self.author, text='старая', image='posts/old.gif'
+        )
+        call_command('migrate_media', '--delete-old', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, small_gif_name)
+        self.assertTrue(post.image.storage.exists(small_gif_name))
+        self.assertFalse(post.image.storage.exists('posts/old.gif'))
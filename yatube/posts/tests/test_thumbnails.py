@@ -0,0 +1,309 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+from core.query_budget import collect
+
+from .. import sorl_compat
+from ..models import Post, User
+from ..thumbnail_gc import collect_thumbnails
+from ..thumbnails import (
+    generate_thumbnails, generate_variants, prefetch_thumbnails
+)
+from .test_forms import small_gif
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class EagerThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=User.objects.create_user(username='thumbs'),
+            text='с картинкой',
+            image=SimpleUploadedFile('thumb.gif', small_gif, 'image/gif'),
+        )
+
+    def test_render_only_reads_generated_thumbnail(self):
+        generate_thumbnails(self.post.image)
+        with mock.patch.object(
+            default.engine, 'create', side_effect=AssertionError
+        ):
+            response = Client().get(reverse('posts:index'))
+        self.assertContains(response, '/media/cache/')
+
+    def test_page_thumbnails_are_fetched_in_one_query(self):
+        for number in range(4):
+            post = Post.objects.create(
+                author=self.post.author,
+                text=f'ещё {number}',
+                image=SimpleUploadedFile(
+                    f'thumb{number}.gif', small_gif, 'image/gif'
+                ),
+            )
+            generate_thumbnails(post.image)
+        generate_thumbnails(self.post.image)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(response.content.decode().count('/media/cache/'), 5)
+
+    def test_missing_thumbnail_is_queued_once(self):
+        with mock.patch('posts.thumbnails.schedule_thumbnails') as schedule:
+            response = Client().get(reverse('posts:index'))
+            prefetch_thumbnails([self.post])
+        schedule.assert_called_once()
+        self.assertTrue(self.post.thumbnail_pending)
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, '/media/cache/')
+
+    def test_page_without_prefetch_exceeds_budget(self):
+        for number in range(4):
+            Post.objects.create(
+                author=self.post.author,
+                text=f'ещё {number}',
+                image=SimpleUploadedFile(
+                    f'thumb{number}.gif', small_gif, 'image/gif'
+                ),
+            )
+        with mock.patch('posts.views.prefetch_thumbnails'), \
+                collect() as violations:
+            Client().get(reverse('posts:index'))
+        violation, = violations
+        self.assertEqual(violation.view, 'posts.views.index')
+
+
+class DictKVStore(KVStoreBase):
+    """kvstore без пакетного чтения, как redis_kvstore из sorl."""
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+        self.reads = 0
+
+    def _get_raw(self, key):
+        self.reads += 1
+        return self.data.get(key)
+
+    def _set_raw(self, key, value):
+        self.data[key] = value
+
+    def _delete_raw(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SorlCompatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='compat')
+        self.posts = [
+            Post.objects.create(
+                author=author,
+                text=f'пост {number}',
+                image=make_image(40 + number, 30),
+            )
+            for number in range(3)
+        ]
+
+    def test_version_check(self):
+        self.assertTrue(sorl_compat._is_supported('12.7.0'))
+        self.assertTrue(sorl_compat._is_supported(None))
+        self.assertFalse(sorl_compat._is_supported('13.0'))
+
+    def test_other_kvstore_is_read_once_per_post(self):
+        kvstore = DictKVStore()
+        with mock.patch.object(default, 'kvstore', kvstore):
+            for post in self.posts:
+                generate_thumbnails(post.image)
+            kvstore.reads = 0
+            with self.assertNumQueries(1):
+                prefetch_thumbnails(self.posts)
+        # Единственный запрос — варианты, kvstore читается по посту.
+        self.assertEqual(kvstore.reads, len(self.posts))
+        for post in self.posts:
+            self.assertIsNotNone(post.thumbnail)
+
+    def test_unsupported_sorl_leaves_thumbnails_to_tag(self):
+        with mock.patch.object(sorl_compat, 'SUPPORTED', False), \
+                mock.patch('posts.thumbnails.schedule_thumbnails') as queue, \
+                collect() as violations:
+            prefetch_thumbnails(self.posts)
+            response = Client().get(reverse('posts:index'))
+        queue.assert_not_called()
+        # Тег thumbnail ходит в kvstore по посту, это видно в бюджете.
+        violation, = violations
+        self.assertEqual(violation.view, 'posts.views.index')
+        for post in self.posts:
+            self.assertIsNone(post.thumbnail)
+            self.assertFalse(post.thumbnail_pending)
+        self.assertEqual(
+            response.content.decode().count('/media/cache/'), len(self.posts)
+        )
+
+
+def make_image(width, height):
+    buffer = BytesIO()
+    Image.effect_noise((width, height), 64).convert('RGB').save(
+        buffer, 'PNG'
+    )
+    return SimpleUploadedFile('photo.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='variants')
+
+    def create_post(self, width, height):
+        return Post.objects.create(
+            author=self.author, text='фото', image=make_image(width, height)
+        )
+
+    def test_variants_are_not_wider_than_original(self):
+        post = self.create_post(700, 400)
+        generate_variants(post)
+        widths = set(post.variants.values_list('width', flat=True))
+        self.assertEqual(widths, {320, 640})
+        small = self.create_post(200, 100)
+        generate_variants(small)
+        self.assertEqual(
+            set(small.variants.values_list('width', flat=True)), {200}
+        )
+
+    @override_settings(POST_IMAGE_VARIANTS=((320, 8 * 1024),))
+    def test_variants_fit_byte_budget(self):
+        post = self.create_post(1000, 400)
+        generate_variants(post)
+        for variant in post.variants.all():
+            with self.subTest(format=variant.format):
+                self.assertLessEqual(variant.size, 8 * 1024)
+                self.assertEqual(variant.image.size, variant.size)
+
+    def test_replaced_or_cleared_image_drops_variants(self):
+        post = self.create_post(700, 400)
+        generate_variants(post)
+        post.image = make_image(500, 300)
+        post.save()
+        self.assertFalse(post.variants.exists())
+        generate_variants(post)
+        self.assertTrue(post.variants.exists())
+        post.image = None
+        post.save()
+        self.assertFalse(post.variants.exists())
+
+    def test_variants_of_replaced_image_are_discarded(self):
+        post = self.create_post(700, 400)
+        stale = Post.objects.get(pk=post.pk)
+        post.image = make_image(500, 300)
+        post.save()
+        stale_lock = f'posts:variants-lock:{stale.pk}:{stale.image.name}'
+        cache.add(stale_lock, 1)
+        generate_variants(post)
+        self.assertTrue(post.variants.exists())
+        cache.delete(stale_lock)
+        generate_variants(stale)
+        self.assertEqual(
+            set(post.variants.values_list('width', flat=True)), {320}
+        )
+
+    def test_card_renders_picture_with_srcset(self):
+        post = self.create_post(1000, 400)
+        generate_variants(post)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        for variant in post.variants.all():
+            with self.subTest(format=variant.format, width=variant.width):
+                self.assertContains(
+                    response, f'{variant.image.url} {variant.width}w'
+                )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailGCTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'cache'), True)
+        self.author = User.objects.create_user(username='gc')
+
+    def create_post(self, width):
+        post = Post.objects.create(
+            author=self.author, text='фото', image=make_image(width, 100)
+        )
+        generate_thumbnails(post.image)
+        geometry, options = settings.POST_THUMBNAILS[0]
+        return post, get_thumbnail(post.image, geometry, **options)
+
+    def test_deleted_post_thumbnails_are_swept(self):
+        post, thumbnail = self.create_post(300)
+        post.delete()
+        report = collect_thumbnails()
+        self.assertEqual(report['sources'], 1)
+        self.assertEqual(report['orphans'], 1)
+        self.assertFalse(default.storage.exists(thumbnail.name))
+        self.assertIsNone(default.kvstore.get(thumbnail))
+
+    def test_dry_run_keeps_orphaned_files(self):
+        default.storage.save('cache/aa/bb/stray.jpg', ContentFile(b'x'))
+        report = collect_thumbnails(dry_run=True)
+        self.assertEqual(report['orphans'], 1)
+        self.assertTrue(default.storage.exists('cache/aa/bb/stray.jpg'))
+        collect_thumbnails()
+        self.assertFalse(default.storage.exists('cache/aa/bb/stray.jpg'))
+
+    def test_budget_evicts_least_recently_read(self):
+        old_post, old = self.create_post(300)
+        new_post, new = self.create_post(400)
+        os.utime(default.storage.path(old.name), (1, 1))
+        size = default.storage.size(new.name)
+        updated = old_post.updated
+        call_command(
+            'gc_thumbnails', '--budget', str(size), stdout=StringIO()
+        )
+        self.assertFalse(default.storage.exists(old.name))
+        self.assertTrue(default.storage.exists(new.name))
+        self.assertIsNone(default.kvstore.get(old))
+        old_post.refresh_from_db()
+        self.assertGreater(old_post.updated, updated)
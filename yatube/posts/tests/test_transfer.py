@@ -0,0 +1,69 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, User
+from ..search import search_posts
+from ..transfer import SiteImporter
+
+
+class SiteTransferTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.author, group=group, text='Перенесённый пост'
+        )
+        Comment.objects.create(post=self.post, author=self.reader, text='к')
+        Follow.objects.create(user=self.reader, author=self.author)
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        call_command('export_site', self.path, stdout=StringIO())
+
+    def test_round_trip_into_empty_database(self):
+        pub_date = self.post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command(
+            'import_site', self.path, '--batch-size', '1', stdout=StringIO()
+        )
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.text, 'Перенесённый пост')
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments_count, 1)
+        reader = User.objects.get(username='reader')
+        self.assertEqual(list(reader.timeline.values_list('post', flat=True)),
+                         [post.pk])
+        self.assertEqual(reader.counters.following_count, 1)
+        self.assertEqual(search_posts('перенесенные'), [post.pk])
+
+    def test_existing_users_and_groups_are_reused(self):
+        call_command('import_site', self.path, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(self.author.posts.count(), 2)
+        self.assertEqual(Comment.objects.filter(author=self.reader).count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_existing_keys_are_looked_up_within_query_params_limit(self):
+        for number in range(5):
+            User.objects.create_user(username=f'user{number}')
+        usernames = list(User.objects.values_list('username', flat=True))
+        importer = SiteImporter()
+        features = mock.patch.object(
+            connection.features, 'max_query_params', 3
+        )
+        with features, self.assertNumQueries(3):
+            found = importer.find_existing(User, 'username', usernames)
+        self.assertEqual(
+            found, dict(User.objects.values_list('username', 'pk'))
+        )
@@ -3,8 +3,10 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -182,3 +184,44 @@ class PostPagesTests(TestCase):
         self.assertNotIn(
             PostPagesTests.post1, response.context['page_obj']
         )
+
+
+class ListingQueriesTests(TestCase):
+    """Число запросов страницы не зависит от числа авторов и групп."""
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def add_posts(self, prefix, count):
+        for number in range(count):
+            author = User.objects.create_user(username=f'{prefix}{number}')
+            group = Group.objects.create(
+                title=f'{prefix}{number}',
+                slug=f'{prefix}{number}',
+                description='Описание'
+            )
+            post = Post.objects.create(author=author, group=group, text='т')
+            Comment.objects.create(post=post, author=author, text='к')
+        return post
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        return len(queries)
+
+    def test_listing_queries_are_constant(self):
+        post = self.add_posts('a', 2)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        before = [self.count_queries(url) for url in urls]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text='ещё')
+            for author in User.objects.all()
+        )
+        self.add_posts('b', 6)
+        after = [self.count_queries(url) for url in urls]
+        self.assertEqual(before, after)
@@ -0,0 +1,153 @@
+import os
+
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .cache import bump_listing_version
+from .models import Post
+
+
+def release_image(name):
+    """Удаляет превью и записи kvstore картинки, которую никто не показывает.
+
+    Файлы лежат по хешу содержимого, поэтому одна картинка может быть
+    у нескольких постов: превью остаются, пока на неё есть ссылка.
+    """
+    if not name or Post.objects.filter(image=name).exists():
+        return
+    storage = Post._meta.get_field('image').storage
+    default.kvstore.delete(ImageFile(name, storage))
+
+
+def _cache_files(storage):
+    root = storage.path(sorl_settings.THUMBNAIL_PREFIX)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location)
+            yield name.replace(os.sep, '/'), os.stat(path)
+
+
+def _remove_empty_dirs(storage):
+    root = storage.path(sorl_settings.THUMBNAIL_PREFIX)
+    for directory, subdirs, files in os.walk(root, topdown=False):
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def _sweep_sources(kvstore, report, dry_run):
+    """Выбрасывает из kvstore картинки без постов.
+
+    Возвращает превью живых картинок: {имя файла: (ключ картинки,
+    ключ превью, имя картинки)}.
+    """
+    live_images = set(
+        Post.objects.exclude(image='').values_list('image', flat=True)
+    )
+    kept = {}
+    for source_key in list(kvstore._find_keys(identity='thumbnails')):
+        source = kvstore._get(source_key)
+        thumbnail_keys = kvstore._get(source_key, identity='thumbnails') or []
+        if source is not None and source.name in live_images:
+            for key in thumbnail_keys:
+                thumbnail = kvstore._get(key)
+                if thumbnail is not None:
+                    kept[thumbnail.name] = (source_key, key, source.name)
+            continue
+        report['sources'] += 1
+        if not dry_run:
+            for key in thumbnail_keys:
+                kvstore._delete(key)
+            kvstore._delete(source_key, identity='thumbnails')
+            kvstore._delete(source_key)
+    return kept
+
+
+def _sweep_orphans(storage, kept, report, dry_run):
+    """Удаляет файлы без записи в kvstore.
+
+    Возвращает [(atime, размер, имя)] оставшихся файлов.
+    """
+    files = []
+    for name, stat in _cache_files(storage):
+        if name in kept:
+            files.append((stat.st_atime, stat.st_size, name))
+            continue
+        report['orphans'] += 1
+        report['orphan_bytes'] += stat.st_size
+        if not dry_run:
+            storage.delete(name)
+    return files
+
+
+def _evict(kvstore, storage, files, kept, budget, report, dry_run):
+    """Вытесняет давно не читанные превью, пока объём больше budget.
+
+    Возвращает {ключ картинки: (имя картинки, ключи вытесненных превью)}.
+    """
+    total = sum(size for _, size, _ in files)
+    evicted = {}
+    for _, size, name in sorted(files):
+        if budget is None or total <= budget:
+            break
+        total -= size
+        report['evicted'] += 1
+        report['evicted_bytes'] += size
+        source_key, key, source_name = kept.pop(name)
+        evicted.setdefault(source_key, (source_name, set()))[1].add(key)
+        if not dry_run:
+            storage.delete(name)
+            kvstore._delete(key)
+    report['kept'] = len(kept)
+    report['kept_bytes'] = total
+    return evicted
+
+
+def _forget_evicted(kvstore, evicted):
+    """Убирает вытесненные превью из kvstore и обновляет их посты."""
+    for source_key, (_, keys) in evicted.items():
+        thumbnail_keys = kvstore._get(source_key, identity='thumbnails') or []
+        remaining = [key for key in thumbnail_keys if key not in keys]
+        if remaining:
+            kvstore._set(source_key, remaining, identity='thumbnails')
+        else:
+            kvstore._delete(source_key, identity='thumbnails')
+    if evicted:
+        Post.objects.filter(
+            image__in=[name for name, _ in evicted.values()]
+        ).update(updated=timezone.now())
+        bump_listing_version()
+
+
+def collect_thumbnails(budget=None, dry_run=False):
+    """Чистит кеш превью sorl и возвращает отчёт о сделанном.
+
+    1. Превью картинок, которых нет ни у одного поста, выбрасываются
+       из kvstore.
+    2. Файлы в THUMBNAIL_PREFIX, на которые не ссылается kvstore,
+       удаляются.
+    3. Если оставшиеся превью занимают больше budget байт, удаляются
+       давно не читанные (по atime), пока объём не влезет в бюджет.
+       Карточки постов с вытесненными превью перерисовываются.
+
+    С dry_run ничего не удаляется, отчёт считается так же.
+    """
+    kvstore = default.kvstore
+    storage = default.storage
+    report = dict.fromkeys((
+        'sources', 'orphans', 'orphan_bytes',
+        'evicted', 'evicted_bytes', 'kept', 'kept_bytes',
+    ), 0)
+    kept = _sweep_sources(kvstore, report, dry_run)
+    files = _sweep_orphans(storage, kept, report, dry_run)
+    evicted = _evict(
+        kvstore, storage, files, kept, budget, report, dry_run
+    )
+    if dry_run:
+        return report
+    _forget_evicted(kvstore, evicted)
+    kvstore.cleanup()
+    _remove_empty_dirs(storage)
+    return report
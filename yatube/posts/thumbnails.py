@@ -0,0 +1,222 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.query_budget import exempt
+
+from . import sorl_compat
+from .cache import bump_listing_version
+from .models import Post, PostImageVariant
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAILS_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate_thumbnails(image):
+    """Готовит все превью из POST_THUMBNAILS для картинки поста.
+
+    Замок на каждую пару картинка-геометрия берётся через cache.add,
+    поэтому одно и то же превью не строят два процесса сразу.
+    """
+    for geometry, options in settings.POST_THUMBNAILS:
+        lock_key = f'posts:thumbnail-lock:{image.name}:{geometry}'
+        if not cache.add(lock_key, 1, settings.POST_THUMBNAILS_LOCK_TIMEOUT):
+            continue
+        try:
+            get_thumbnail(image, geometry, **options)
+        except Exception:
+            logger.exception('Не удалось построить превью %s', image.name)
+        finally:
+            cache.delete(lock_key)
+
+
+def _can_save(image_format):
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def _variant_widths(width, height):
+    """Ширины вариантов с бюджетами, не шире оригинала."""
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    largest = min(width, height * aspect_width // aspect_height)
+    widths = [
+        (variant_width, budget)
+        for variant_width, budget in settings.POST_IMAGE_VARIANTS
+        if variant_width <= largest
+    ]
+    if not widths:
+        widths = [(max(largest, 1), settings.POST_IMAGE_VARIANTS[0][1])]
+    return widths
+
+
+def _encode(image, image_format, budget):
+    """Сжимает картинку, снижая качество, пока она не влезет в бюджет."""
+    for quality in settings.POST_IMAGE_QUALITIES:
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=quality, optimize=True)
+        if buffer.tell() <= budget:
+            break
+    else:
+        logger.warning(
+            'Вариант %s %sw не влез в бюджет %s байт: %s',
+            image_format, image.width, budget, buffer.tell()
+        )
+    return buffer.getvalue()
+
+
+def generate_variants(post):
+    """Строит адаптивные варианты картинки поста и заменяет ими старые.
+
+    После замены меняется post.updated и версия списков, чтобы карточки
+    из кеша фрагментов перерисовались уже с <picture>. Замок берётся на
+    файл картинки: новую картинку не ждёт сборка прежней, а варианты
+    картинки, которую уже заменили, выбрасываются.
+    """
+    lock_key = f'posts:variants-lock:{post.pk}:{post.image.name}'
+    if not cache.add(lock_key, 1, settings.POST_THUMBNAILS_LOCK_TIMEOUT):
+        return
+    try:
+        storage = post.image.storage
+        with storage.open(post.image.name) as source_file:
+            source = Image.open(source_file)
+            source = ImageOps.exif_transpose(source).convert('RGB')
+        aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+        formats = [
+            image_format for image_format in settings.POST_IMAGE_FORMATS
+            if _can_save(image_format)
+        ]
+        variants = []
+        for width, budget in _variant_widths(*source.size):
+            height = max(round(width * aspect_height / aspect_width), 1)
+            resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+            for image_format in formats:
+                content = _encode(resized, image_format, budget)
+                variant = PostImageVariant(
+                    post=post, format=image_format, width=width,
+                    height=height, size=len(content),
+                )
+                variant.image.save(
+                    f'{post.pk}_{width}.{image_format.lower()}',
+                    ContentFile(content),
+                    save=False,
+                )
+                variants.append(variant)
+        with transaction.atomic():
+            current = Post.objects.filter(pk=post.pk).values_list(
+                'image', flat=True
+            ).first()
+            if current == post.image.name:
+                post.variants.all().delete()
+                PostImageVariant.objects.bulk_create(variants)
+                Post.objects.filter(pk=post.pk).update(
+                    updated=timezone.now()
+                )
+        if current != post.image.name:
+            for variant in variants:
+                variant.image.storage.delete(variant.image.name)
+            return
+        bump_listing_version()
+    except Exception:
+        logger.exception('Не удалось построить варианты %s', post.image.name)
+    finally:
+        cache.delete(lock_key)
+
+
+def process_image(post):
+    """Всё, что строится из картинки поста после загрузки."""
+    generate_thumbnails(post.image)
+    generate_variants(post)
+
+
+def _process_in_worker(post):
+    try:
+        process_image(post)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnails(post):
+    """Ставит построение превью и вариантов в очередь после коммита."""
+    if not post.image:
+        return
+    if settings.POST_THUMBNAILS_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_process_in_worker, post)
+        )
+    else:
+        # В фоне эта работа не входит в бюджет запроса, здесь тоже.
+        transaction.on_commit(lambda: _process_exempt(post))
+
+
+def _process_exempt(post):
+    with exempt():
+        process_image(post)
+
+
+def prefetch_thumbnails(posts):
+    """Находит превью и варианты картинок для всей страницы разом.
+
+    Найденное превью кладётся в post.thumbnail, варианты подгружаются
+    одним запросом. Если у картинки нет ни превью, ни вариантов, они
+    ставятся в очередь, а post.thumbnail_pending говорит карточке
+    показать пока оригинал. Тегом thumbnail карточка строит превью,
+    только если страницу не прогнали через эту функцию, и такие запросы
+    к kvstore честно входят в бюджет страницы. Так же страница строится,
+    если sorl_compat не поддерживает установленную версию sorl.
+    """
+    posts = list(posts)
+    for post in posts:
+        post.thumbnail = None
+        post.thumbnail_pending = False
+    prefetch_related_objects(posts, 'variants')
+    if not sorl_compat.SUPPORTED:
+        return
+    geometry, options = settings.POST_THUMBNAILS[0]
+    thumbnails = {}
+    for post in posts:
+        if post.image:
+            thumbnail = sorl_compat.thumbnail_file(
+                ImageFile(post.image), geometry, options
+            )
+            thumbnails.setdefault(thumbnail.key, (thumbnail, []))
+            thumbnails[thumbnail.key][1].append(post)
+    if not thumbnails:
+        return
+    found = sorl_compat.get_many(
+        [thumbnail for thumbnail, _ in thumbnails.values()]
+    )
+    for key, image_file in found.items():
+        for post in thumbnails[key][1]:
+            post.thumbnail = image_file
+    for post in posts:
+        if post.image and post.thumbnail is None and not post.variants.all():
+            post.thumbnail_pending = True
+            _queue_missing(post)
+
+
+def _queue_missing(post):
+    """Ставит построение в очередь не чаще раза в время жизни замка."""
+    queued_key = f'posts:thumbnails-queued:{post.pk}:{post.image.name}'
+    if cache.add(queued_key, 1, settings.POST_THUMBNAILS_LOCK_TIMEOUT):
+        schedule_thumbnails(post)
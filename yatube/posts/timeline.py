@@ -0,0 +1,47 @@
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+
+def _copy_posts(where, params):
+    """Копирует посты в ленты одним INSERT ... SELECT без выборки в Python."""
+    entry_table = TimelineEntry._meta.db_table
+    post_table = Post._meta.db_table
+    follow_table = Follow._meta.db_table
+    sql = (
+        f'INSERT INTO {entry_table} (user_id, post_id, author_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM {follow_table} f '
+        f'INNER JOIN {post_table} p ON p.author_id = f.author_id '
+        f'WHERE {where}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    return _copy_posts('p.id = %s', [post.pk])
+
+
+def backfill_timeline(user, author):
+    """Добавляет в ленту подписчика все посты автора."""
+    return _copy_posts(
+        'f.user_id = %s AND f.author_id = %s', [user.pk, author.pk]
+    )
+
+
+def clear_timeline(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    deleted, _ = TimelineEntry.objects.filter(
+        user=user, author=author
+    ).delete()
+    return deleted
+
+
+@transaction.atomic
+def rebuild_timelines():
+    """Пересобирает ленты всех пользователей с нуля."""
+    TimelineEntry.objects.all().delete()
+    return _copy_posts('1 = 1', [])
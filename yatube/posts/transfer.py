@@ -0,0 +1,210 @@
+"""Построчный перенос данных сайта в JSON Lines и обратно.
+
+Каждая строка файла — одна запись в том же виде, что у dumpdata:
+{"model": "posts.post", "pk": 1, "fields": {...}}, внешние ключи
+хранятся как первичные ключи. Записи идут по моделям в порядке MODELS,
+поэтому при загрузке всё, на что ссылается строка, уже вставлено.
+"""
+import datetime
+import json
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.db.batches import batch_size
+
+from .cache import bump_listing_version
+from .counters import repair_counters
+from .models import Comment, Follow, Group, Post, User
+from .search import get_engine
+from .timeline import rebuild_timelines
+
+# Модель, её поля, внешние ключи (поле -> модель) и естественный ключ,
+# по которому запись совпадает с уже существующей в базе.
+MODELS = (
+    (User, (
+        'username', 'password', 'email', 'first_name', 'last_name',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined',
+        'last_login',
+    ), {}, 'username'),
+    (Group, ('title', 'slug', 'description'), {}, 'slug'),
+    (Post, ('text', 'pub_date', 'updated', 'image'), {
+        'author': User, 'group': Group,
+    }, None),
+    (Comment, ('text', 'created'), {'post': Post, 'author': User}, None),
+    (Follow, (), {'user': User, 'author': User}, None),
+)
+SPECS = {spec[0]._meta.label_lower: spec for spec in MODELS}
+
+
+class SiteJSONEncoder(DjangoJSONEncoder):
+    """Как DjangoJSONEncoder, но хранит время с микросекундами."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты из файла.
+
+    Меняет поля моделей на время блока, поэтому годится только для
+    команд, а не для кода, который работает рядом с запросами.
+    """
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            flags = {
+                name: getattr(field, name)
+                for name in ('auto_now', 'auto_now_add')
+                if getattr(field, name, False)
+            }
+            if flags:
+                changed.append((field, flags))
+                for name in flags:
+                    setattr(field, name, False)
+    try:
+        yield
+    finally:
+        for field, flags in changed:
+            for name, value in flags.items():
+                setattr(field, name, value)
+
+
+def export_site(stream, chunk_size=2000):
+    """Пишет все записи в stream по строке, возвращает их число."""
+    written = 0
+    for model, fields, foreign_keys, _ in MODELS:
+        columns = list(fields) + [f'{name}_id' for name in foreign_keys]
+        rows = model.objects.order_by('pk').values('pk', *columns)
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = {
+                'model': model._meta.label_lower,
+                'pk': row['pk'],
+                'fields': {
+                    **{name: row[name] for name in fields},
+                    **{name: row[f'{name}_id'] for name in foreign_keys},
+                },
+            }
+            stream.write(json.dumps(
+                record, cls=SiteJSONEncoder, ensure_ascii=False
+            ))
+            stream.write('\n')
+            written += 1
+    return written
+
+
+class SiteImporter:
+    """Загружает записи пачками bulk_create, переназначая ключи.
+
+    Новый первичный ключ — старый плюс максимальный ключ таблицы до
+    загрузки, поэтому таблица соответствия не нужна. Отдельно
+    запоминаются только пользователи и группы, которые уже есть в базе
+    с тем же username или slug: ссылки на них ведут на существующие.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.offsets = {
+            model: model.objects.aggregate(top=Max('pk'))['top'] or 0
+            for model, *_ in MODELS
+        }
+        self.existing = {User: {}, Group: {}}
+        self.counts = dict.fromkeys(
+            (model._meta.label_lower for model, *_ in MODELS), 0
+        )
+
+    def remap(self, model, pk):
+        if pk is None:
+            return None
+        known = self.existing.get(model, {})
+        if pk in known:
+            return known[pk]
+        return pk + self.offsets[model]
+
+    def build(self, record):
+        model, fields, foreign_keys, _ = SPECS[record['model']]
+        values = record['fields']
+        obj = model(pk=self.remap(model, record['pk']))
+        for name in fields:
+            if name in values:
+                field = model._meta.get_field(name)
+                setattr(obj, field.attname, field.to_python(values[name]))
+        for name, target in foreign_keys.items():
+            setattr(obj, f'{name}_id', self.remap(target, values.get(name)))
+        return obj
+
+    def find_existing(self, model, natural_key, values):
+        """Возвращает {естественный ключ: pk} для уже сохранённых записей.
+
+        Ищет частями, чтобы IN не упёрся в лимит переменных базы.
+        """
+        size = batch_size(connection, len(values))
+        found = {}
+        for start in range(0, len(values), size):
+            found.update(model.objects.filter(**{
+                f'{natural_key}__in': values[start:start + size],
+            }).values_list(natural_key, 'pk'))
+        return found
+
+    def flush(self, label, objects):
+        if not objects:
+            return
+        model, _, _, natural_key = SPECS[label]
+        if natural_key:
+            found = self.find_existing(model, natural_key, [
+                getattr(obj, natural_key) for obj in objects
+            ])
+            fresh = []
+            for obj in objects:
+                pk = found.get(getattr(obj, natural_key))
+                if pk is None:
+                    fresh.append(obj)
+                else:
+                    self.existing[model][obj.pk - self.offsets[model]] = pk
+            objects = fresh
+        with transaction.atomic():
+            model.objects.bulk_create(
+                objects, ignore_conflicts=model is Follow
+            )
+        self.counts[label] += len(objects)
+
+    def load(self, lines):
+        label, batch = None, []
+        with preserve_timestamps(*(model for model, *_ in MODELS)):
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['model'] not in SPECS:
+                    continue
+                if record['model'] != label or len(batch) >= self.batch_size:
+                    self.flush(label, batch)
+                    label, batch = record['model'], []
+                batch.append(self.build(record))
+            self.flush(label, batch)
+        self.reset_sequences()
+        return self.counts
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [model for model, *_ in MODELS]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived(search=True):
+    """Пересобирает то, что при обычной записи поддерживают сигналы."""
+    rebuild_timelines()
+    repair_counters()
+    if search:
+        with transaction.atomic():
+            get_engine().rebuild(Post.objects.all())
+    bump_listing_version()
@@ -0,0 +1,86 @@
+import math
+import tempfile
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+
+def open_header(upload):
+    """Открывает загруженную картинку, читая только заголовок.
+
+    Pillow не декодирует пиксели до первого обращения к ним, поэтому
+    размеры и формат проверяются без распаковки. Картинки, у которых
+    пикселей больше POST_IMAGE_MAX_PIXELS, отклоняются как бомбы.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='too_large',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(
+                upload, formats=settings.POST_IMAGE_UPLOAD_FORMATS
+            )
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError(
+            'Картинка слишком большая.', code='decompression_bomb'
+        )
+    except Exception:
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая.', code='decompression_bomb'
+        )
+    return image
+
+
+def downscale(upload, image):
+    """Уменьшает оригинал до POST_IMAGE_MAX_SIDE по большей стороне.
+
+    Возвращает новый файл во временной папке или исходный, если
+    уменьшать нечего. JPEG декодируется сразу уменьшенным в 2–8 раз,
+    остальные форматы — целиком, поэтому картинка, которую и после этого
+    пришлось бы распаковать больше чем в POST_IMAGE_MAX_DECODE_PIXELS
+    пикселей, отклоняется. Новый файл пишется без EXIF, поэтому поворот
+    из тега Orientation применяется к самим пикселям.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if max(image.size) <= max_side:
+        return upload
+    image_format = image.format
+    if image_format == 'JPEG':
+        ratio = max_side / max(image.size)
+        image.draft(image.mode, (
+            math.ceil(image.width * ratio), math.ceil(image.height * ratio)
+        ))
+    limit = settings.POST_IMAGE_MAX_DECODE_PIXELS
+    if image.width * image.height > limit:
+        raise ValidationError(
+            'Картинка слишком большая: уменьшите её до %(limit)s Мп.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6},
+        )
+    try:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+    except Exception:
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    output = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    image.save(output, image_format)
+    downscaled = UploadedFile(
+        output, upload.name, Image.MIME.get(image_format), output.tell()
+    )
+    downscaled.seek(0)
+    return downscaled
@@ -1,31 +1,39 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.query_budget import query_budget
+
+from .cache import cache_listing
+from .counters import counters_for
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .search import search_posts
+from .thumbnails import prefetch_thumbnails, schedule_thumbnails
+from .timeline import backfill_timeline, clear_timeline
 
 
-@cache_page(15)
+@query_budget(8)
+@cache_listing
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAGE_VOL)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginator_view(request, Post.objects.for_listing())
+    prefetch_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(8)
+@cache_listing
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.PAGE_VOL)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_listing()
+    page_obj = paginator_view(request, posts)
+    prefetch_thumbnails(page_obj)
     context = {
         'group': group,
         'posts': posts,
@@ -34,13 +42,16 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(8)
+@cache_listing
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count = posts.count()
-    paginator = Paginator(posts, settings.PAGE_VOL)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    posts = author.posts.for_listing()
+    count = counters_for(author).posts_count
+    page_obj = paginator_view(request, posts, count=count)
+    prefetch_thumbnails(page_obj)
     following = (
         request.user.is_authenticated
         and request.user.username != username
@@ -56,9 +67,34 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_posts(query), settings.PAGE_VOL)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    posts = Post.objects.for_listing().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    prefetch_thumbnails(page_obj)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': page_obj,
+    })
+
+
+@query_budget(7)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_listing()
+        .select_related('author__counters')
+        .prefetch_related('variants')
+        .with_comments(),
+        pk=post_id,
+    )
+    counters_for(post.author)
+    prefetch_thumbnails([post])
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -68,6 +104,7 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(10)
 @login_required
 def post_create(request):
     template = 'posts/post_create.html'
@@ -79,16 +116,18 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnails(post)
         return redirect('posts:profile', request.user)
     context = {'form': form}
     return render(request, template, context)
 
 
+@query_budget(13)
 @login_required
 def post_edit(request, post_id):
     template = 'posts/post_create.html'
     post = get_object_or_404(Post, id=post_id)
-    if post.author.id != request.user.id:
+    if post.author_id != request.user.id:
         return redirect('posts:index')
     form = PostForm(
         request.POST or None,
@@ -97,6 +136,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, template, {
         'form': form,
@@ -105,6 +146,7 @@ def post_edit(request, post_id):
     })
 
 
+@query_budget(7)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -117,35 +159,59 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
-def paginator_view(request, post_list):
+def paginator_view(request, post_list, keys=('pub_date', 'id'), count=None):
+    if settings.CURSOR_PAGINATION:
+        paginator = CursorPaginator(post_list, settings.PAGE_VOL, keys)
+        return paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
     paginator = Paginator(post_list, settings.PAGE_VOL)
+    if count is not None:
+        # Счётчик уже известен, отдельный COUNT(*) не нужен.
+        paginator.count = count
     page_nubmer = request.GET.get('page')
     return paginator.get_page(page_nubmer)
 
 
+@query_budget(8)
 @login_required
 def follow_index(request):
-    page_obj = paginator_view(request, Post.objects.filter(
-        author__following__user=request.user
-    ))
+    page_obj = paginator_view(
+        request,
+        request.user.timeline.select_related('post__author', 'post__group'),
+        keys=('pub_date', 'post_id'),
+    )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    prefetch_thumbnails(page_obj)
     return render(request, 'posts/follow.html', {
         'page_obj': page_obj,
     })
 
 
+@query_budget(14)
 @login_required
 def profile_follow(request, username):
     if request.user.username != username:
         author = get_object_or_404(User, username=username)
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(
+                user=request.user, author=author
+            )
+            if created:
+                backfill_timeline(request.user, author)
     return redirect('posts:profile', username)
 
 
+@query_budget(11)
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(
+    follow = get_object_or_404(
         Follow,
         user=request.user,
         author__username=username
-    ).delete()
+    )
+    with transaction.atomic():
+        follow.delete()
+        clear_timeline(request.user, follow.author_id)
     return redirect('posts:profile', username=username)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -40,14 +41,130 @@ ALLOWED_HOSTS = [
     '*',
 ]
 PAGE_VOL = 10
+# Keyset-пагинация списков постов вместо номеров страниц.
+CURSOR_PAGINATION = False
 UPLOAD_TO = 'posts/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кеш общий для всех процессов машины: версия списков, сами списки и
+# замки на их пересборку должны быть одни на все воркеры. Несколько машин
+# потребуют memcached или redis. После migrate кеш очищается.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SharedFileCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yatube-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+# Списки постов сбрасываются по сигналам, поэтому их можно держать долго.
+# Если кеш всё же свой у каждого процесса (LocMemCache), другой процесс
+# узнаёт о записи только по истечении LISTING_CACHE_LOCAL_TIMEOUT.
+LISTING_CACHE_TIMEOUT = 60 * 60 * 4
+LISTING_CACHE_LOCAL_TIMEOUT = 15
+# Сколько секунд после истечения отдавать старую копию, пока один
+# запрос пересобирает страницу, и на сколько берётся замок.
+LISTING_CACHE_GRACE = 60
+LISTING_CACHE_LOCK_TIMEOUT = 10
+# Превью картинок постов строятся сразу после загрузки в фоновом потоке,
+# чтобы страница не платила за декодирование и сжатие. Геометрия должна
+# совпадать с тегом thumbnail в posts/includes/post_card.html.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+POST_THUMBNAILS_ASYNC = True
+POST_THUMBNAILS_WORKERS = 2
+POST_THUMBNAILS_LOCK_TIMEOUT = 60
+# Сколько байт может занимать кеш превью sorl, см. gc_thumbnails.
+THUMBNAIL_CACHE_BUDGET = 1024 * 1024 * 1024
+# Адаптивные варианты картинки: ширина и бюджет в байтах на один файл.
+# Шире оригинала варианты не строятся. Форматы перечислены в порядке
+# предпочтения, последний отдаётся в <img> как запасной. Формат, который
+# сборка Pillow не умеет сохранять, пропускается.
+POST_IMAGE_VARIANTS = (
+    (320, 25 * 1024),
+    (640, 60 * 1024),
+    (960, 110 * 1024),
+)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_QUALITIES = (85, 75, 65, 50, 35)
+# Загрузки пишутся во временный файл кусками, а не держатся в памяти.
+# Картинка проверяется по заголовку, бомбы с огромным числом пикселей
+# отклоняются, а оригинал уменьшается до POST_IMAGE_MAX_SIDE. В запросе
+# распаковывается не больше POST_IMAGE_MAX_DECODE_PIXELS пикселей: JPEG
+# декодируется сразу уменьшенным, а больший PNG, GIF или WEBP отклоняется.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_MAX_DECODE_PIXELS = 12 * 1000 * 1000
+
+# Поиск по постам. SQLiteFTSEngine держит FTS5-таблицу с основами слов,
+# для других баз есть posts.search.LikeEngine. Поиск возвращает не больше
+# POST_SEARCH_LIMIT лучших совпадений.
+POST_SEARCH_ENGINE = 'posts.search.SQLiteFTSEngine'
+POST_SEARCH_LIMIT = 1000
+POST_SEARCH_BATCH = 1000
+
+# Админка постов: длина текста в списке, размер пачки для массовых
+# действий (не больше лимита переменных в запросе у базы, для SQLite
+# это 999) и до скольких строк честно считать отфильтрованный список.
+POST_ADMIN_TEXT_LENGTH = 100
+POST_ADMIN_BATCH = 900
+ESTIMATED_COUNT_LIMIT = 10000
+
+# Метрики запросов для Prometheus на /metrics/. Процессы сбрасывают свои
+# цифры в METRICS_DIR (None — каталог yatube-metrics во временной папке),
+# страница их складывает. Открыта персоналу и адресам из
+# METRICS_ALLOWED_IPS; за прокси REMOTE_ADDR будет адресом прокси.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Что делать при DEBUG, если view вышла за бюджет SQL-запросов из
+# core.query_budget: 'log' — предупреждение в лог, 'raise' — исключение.
+QUERY_BUDGET_ACTION = 'log'
+
+# Профиль запроса для сотрудника с токеном из команды profile_token.
+# Стек снимается раз в PROFILER_INTERVAL секунд, в PROFILER_DIR (None —
+# каталог yatube-profiles во временной папке) хранятся PROFILER_KEEP
+# последних отчётов, скачать их можно на /profiles/.
+PROFILER_DIR = None
+PROFILER_INTERVAL = 0.001
+PROFILER_KEEP = 50
+PROFILER_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# Журнал медленных запросов к страницам этих приложений: JSON по строке
+# в SLOW_REQUEST_LOG (None — yatube-slow-requests.jsonl во временной
+# папке), пишется фоновым потоком. Быстрые запросы попадают в журнал с
+# вероятностью SLOW_REQUEST_SAMPLE_RATE. Пороги в секундах.
+SLOW_REQUEST_NAMESPACES = ('posts', 'users', 'about')
+SLOW_REQUEST_THRESHOLD = 0.5
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_REQUEST_SAMPLE_RATE = 0.01
+SLOW_REQUEST_MAX_STATEMENTS = 100
+SLOW_REQUEST_LOG = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_requests': {
+            'class': 'core.slowlog.BackgroundHandler',
+            'filename': SLOW_REQUEST_LOG,
+        },
+    },
+    'loggers': {
+        'yatube.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 # Application definition
 
@@ -66,11 +183,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SlowRequestMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -100,10 +220,15 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.db.sqlite3 включает WAL и прагмы из core/db/sqlite3/base.py и
+# начинает транзакции с BEGIN IMMEDIATE. Соединение живёт CONN_MAX_AGE
+# секунд и проверяется перед каждым запросом. Статистику и свободное
+# место обслуживает команда db_maintenance.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 